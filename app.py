@@ -1,30 +1,64 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, stream_with_context, g
+import hashlib
 import json
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from backend.storage.store import storage
+from backend.auth.auth_service import auth_service
+from backend.video.video_service import catalog
+from utils.metrics import metrics
 
 app = Flask(__name__, 
             template_folder='frontend/templates',
             static_folder='static')
 app.secret_key = 'super-secret-key-for-edubox'
 
-DATA_DIR = 'data'
-USERS_FILE = os.path.join(DATA_DIR, 'users.json')
-VIDEOS_FILE = os.path.join(DATA_DIR, 'videos.json')
-PROGRESS_FILE = os.path.join(DATA_DIR, 'user_progress.json')
+def template_modified(name):
+    # Pages validate against their template as well as the catalog, so a
+    # deploy that only changes markup is not answered with a 304. Unlike a
+    # start time, the file's mtime is the same in every worker.
+    path = os.path.join(app.root_path, app.template_folder, name)
+    return datetime.fromtimestamp(int(os.path.getmtime(path)), tz=timezone.utc)
 
-def load_json(filepath):
-    if not os.path.exists(filepath):
-        return [] if 'progress' not in filepath else {}
-    with open(filepath, 'r') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return [] if 'progress' not in filepath else {}
+LANDING_MODIFIED = template_modified('landing.html')
+LANDING_TAG = format(int(LANDING_MODIFIED.timestamp()), 'x')
 
-def save_json(filepath, data):
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=4)
+def conditional(response, etag, last_modified):
+    # Repeat visitors revalidate with If-None-Match / If-Modified-Since and
+    # get a bodiless 304 while the catalog is unchanged.
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by route, method and status.')
+metrics.describe('http_requests_total', 'counter', 'Requests by route, method and status.')
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request(exc):
+    # Recorded at teardown so unhandled exceptions count as 500s. Labelled by
+    # the route pattern, not the path, so /video/<topic_id> is one series.
+    # Streams keep the request context open, so they are timed to the end.
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    status = g.pop('response_status', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    labels = {'route': route, 'method': request.method,
+              'status': str(500 if exc is not None or status is None else status)}
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+    metrics.inc('http_requests_total', **labels)
 
 
 @app.route('/')
@@ -32,8 +66,26 @@ def index():
     if 'user_id' in session:
         return redirect(url_for('dashboard'))
     
-    videos = load_json(VIDEOS_FILE)
-    return render_template('landing.html', courses=videos)
+    etag = f"{catalog.version}-{LANDING_TAG}"
+    last_modified = max(filter(None, (catalog.last_modified, LANDING_MODIFIED)))
+    if request.if_none_match.contains(etag):
+        # Unchanged: skip rendering, make_conditional answers 304.
+        return conditional(app.response_class(), etag, last_modified)
+    response = app.make_response(render_template('landing.html', courses=catalog.videos()))
+    return conditional(response, etag, last_modified)
+
+@app.route('/api/catalog', methods=['GET'])
+def catalog_listing():
+    category = request.args.get('category')
+    response = jsonify({
+        'success': True,
+        'categories': catalog.categories(),
+        'videos': catalog.videos(category)
+    })
+    etag = catalog.version
+    if category:
+        etag += '-' + hashlib.sha1(category.encode('utf-8')).hexdigest()[:8]
+    return conditional(response, etag, catalog.last_modified)
 
 @app.route('/about')
 def about():
@@ -43,15 +95,27 @@ def about():
 def contact():
     return "Contact Us at support@edubox.com"
 
+def credentials_payload(*fields):
+    # The auth forms post a JSON object of strings; anything else (a
+    # missing body, null or numeric fields) is rejected before it reaches
+    # the auth service.
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    if any(data.get(field) is not None and not isinstance(data.get(field), str) for field in fields):
+        return None
+    return data
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
-        data = request.json
+        data = credentials_payload('email', 'password')
+        if data is None:
+            return jsonify({'success': False, 'message': 'Invalid request'}), 400
         email = data.get('email')
         password = data.get('password')
         
-        users = load_json(USERS_FILE)
-        user = next((u for u in users if u['email'] == email and u['password'] == password), None)
+        user = auth_service.authenticate(email, password)
         
         if user:
             session['user_id'] = user['id']
@@ -64,24 +128,16 @@ def login():
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
-        data = request.json
+        data = credentials_payload('name', 'email', 'password')
+        if data is None:
+            return jsonify({'success': False, 'message': 'Invalid request'}), 400
         name = data.get('name')
         email = data.get('email')
         password = data.get('password')
         
-        users = load_json(USERS_FILE)
-        if any(u['email'] == email for u in users):
-            return jsonify({'success': False, 'message': 'Email already registered'})
-        
-        new_user = {
-            'id': str(len(users) + 1),
-            'name': name,
-            'email': email,
-            'password': password,
-            'created_at': datetime.now().isoformat()
-        }
-        users.append(new_user)
-        save_json(USERS_FILE, users)
+        new_user, error = auth_service.register(name, email, password)
+        if error:
+            return jsonify({'success': False, 'message': error})
         
         session['user_id'] = new_user['id']
         session['user_name'] = new_user['name']
@@ -100,38 +156,26 @@ def dashboard():
         return redirect(url_for('login'))
     
     user_id = session['user_id']
-    videos = load_json(VIDEOS_FILE)
-    progress = load_json(PROGRESS_FILE)
-    user_progress = progress.get(user_id, {})
+    videos = catalog.videos()
+    user_progress = storage.get_progress(user_id)
 
     for video in videos:
         video_p = user_progress.get(video['id'], {})
         video['progress'] = video_p.get('watch_percentage', 0)
     
-    attempts = load_json(QUIZ_ATTEMPTS_FILE)
-    user_attempts = [a for a in attempts if a['user_id'] == user_id]
-    
-    user_attempts.sort(key=lambda x: x['timestamp'])
-    
-    topic_counters = {}
-    temp_labels = []
-    for a in user_attempts:
-        topic = a.get('topic_id', 'Quiz').upper()
-        topic_counters[topic] = topic_counters.get(topic, 0) + 1
-        temp_labels.append(f"{topic} #{topic_counters[topic]}")
-    
-    relevant_attempts = user_attempts[-10:]
-    mastery_history = [round(a['mastery'] * 100, 2) for a in relevant_attempts]
-    mastery_labels = temp_labels[-10:]
+    # Maintained at write time by storage.add_attempt, so this is one keyed
+    # read no matter how many attempts the user has.
+    summary = storage.get_user_summary(user_id)
+    mastery_history = [round(p['mastery'] * 100, 2) for p in summary['recent']]
+    mastery_labels = [p['label'] for p in summary['recent']]
     
     latest_speed = "Standard"
     latest_cluster = "General Learner"
     speed_message = "Keep up the consistent effort!"
     
-    if user_attempts:
-        latest_attempt = user_attempts[-1]
-        latest_speed = latest_attempt.get('adaptation', {}).get('speed_label', 'Standard')
-        latest_cluster = latest_attempt.get('behavior_cluster', 'General Learner')
+    if summary['attempt_count']:
+        latest_speed = summary['latest_speed']
+        latest_cluster = summary['latest_cluster']
         
         if latest_speed == 'Fast':
             speed_message = "You are moving quickly through concepts with high accuracy!"
@@ -155,80 +199,141 @@ def progress_page():
         return redirect(url_for('login'))
     
     user_id = session['user_id']
-    attempts = load_json(QUIZ_ATTEMPTS_FILE)
-    videos = load_json(VIDEOS_FILE)
+    topic_map = catalog.titles()
     
-    topic_map = {v['id']: v['title'] for v in videos}
-    
-    user_attempts = [a for a in attempts if a['user_id'] == user_id]
+    cursor = request.args.get('cursor')
+    user_attempts, next_cursor = storage.get_attempts_page(user_id, cursor)
     for attempt in user_attempts:
         attempt['topic_name'] = topic_map.get(attempt['topic_id'], attempt['topic_id'])
         
-    return render_template('progress.html', attempts=user_attempts)
+    return render_template('progress.html', attempts=user_attempts, next_cursor=next_cursor, is_first_page=not cursor)
+
+@app.route('/api/progress-history')
+def progress_history():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    limit = request.args.get('limit', 20, type=int)
+    user_attempts, next_cursor = storage.get_attempts_page(session['user_id'], request.args.get('cursor'), limit)
+    return jsonify({'success': True, 'attempts': user_attempts, 'next_cursor': next_cursor})
 
 @app.route('/video/<topic_id>')
 def video_page(topic_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    videos = load_json(VIDEOS_FILE)
-    video = next((v for v in videos if v['id'] == topic_id), None)
+    video = catalog.get(topic_id)
     if not video:
         return redirect(url_for('dashboard'))
     
     return render_template('video.html', video=video)
 
 from backend.adaptation.micro_pattern import mp_manager
+from backend.adaptation.tracking import track_ingestor, bad_topic_id
 from backend.adaptation.recommendation import recommender
 from backend.quiz.quiz_generator import quiz_gen
 from backend.quiz.quiz_evaluator import evaluator
+from backend.quiz.quiz_session import quiz_sessions
 from backend.adaptation.speed_adaptation import speed_adapter
 from backend.bkt.bkt_engine import bkt_engine
+from backend.models.registry import model_registry
+from backend.jobs.job_queue import job_queue
+from utils.llm_client import ollama_client
+
+def collect_runtime_metrics():
+    yield ('llm_circuit_open', 'gauge', 'Whether the Ollama circuit breaker is open (1) or closed (0).',
+           {}, int(ollama_client.breaker.state == 'open'))
+    cache = evaluator.cache.stats()
+    yield ('feedback_cache_hits', 'counter', 'Feedback cache lookups served from cache.', {}, cache['hits'])
+    yield ('feedback_cache_misses', 'counter', 'Feedback cache lookups that missed.', {}, cache['misses'])
+    yield ('quiz_bank_entries', 'gauge', 'Quizzes stored in the quiz bank.', {}, quiz_gen.bank.stats()['entries'])
+    for status, count in job_queue.stats().items():
+        yield ('jobs', 'gauge', 'Background jobs by status.', {'status': status}, count)
+
+metrics.add_collector(collect_runtime_metrics)
+
+job_queue.start(int(os.environ.get('EDUBOX_JOB_WORKERS', '2')))
 
-QUIZ_ATTEMPTS_FILE = 'data/quiz_attempts.json'
+# Per-concept BKT parameters from the trained model; the engine picks up
+# later retrains by itself.
+if bkt_engine.load_concept_params():
+    print(f"Loaded BKT parameters for {len(bkt_engine.concept_overrides)} concepts")
+
+if os.environ.get('EDUBOX_PREGENERATE', '1') == '1':
+    quiz_gen.start_pregeneration(catalog.videos())
 
 @app.route('/api/video-track', methods=['POST'])
 def video_track():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    data = request.json
-    user_id = session['user_id']
-    video_id = data.get('topic_id')
+    event = request.get_json(silent=True) or {}
+    if bad_topic_id(event):
+        return jsonify({'success': False, 'message': 'Invalid topic_id'}), 400
+    success, _ = track_ingestor.ingest(session['user_id'], [event])
     
-    interaction_data = {
-        "pause_count": data.get('pause_count', 0),
-        "rewatch_count": data.get('rewatch_count', 0),
-        "skip_ratio": data.get('skip_ratio', 0),
-        "watch_percentage": data.get('watch_percentage', 0)
-    }
+    if success:
+        return jsonify({'success': True})
+    else:
+        return jsonify({'success': False, 'message': 'Logging failed'}), 500
+
+@app.route('/api/video-track/batch', methods=['POST'])
+def video_track_batch():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    success = mp_manager.log_interaction(user_id, video_id, interaction_data)
+    # sendBeacon bodies may arrive as text/plain, so parse regardless of type.
+    data = request.get_json(force=True, silent=True)
+    events = data.get('events') if isinstance(data, dict) else data
+    if not isinstance(events, list):
+        return jsonify({'success': False, 'message': 'Expected a list of events'}), 400
+    if any(bad_topic_id(event) for event in events):
+        return jsonify({'success': False, 'message': 'Invalid topic_id'}), 400
     
-    progress = load_json(PROGRESS_FILE)
-    if user_id not in progress:
-        progress[user_id] = {}
-    progress[user_id][video_id] = {
-        "last_position": data.get('last_time', 0),
-        "watch_percentage": data.get('watch_percentage', 0),
-        "timestamp": datetime.now().isoformat()
-    }
-    save_json(PROGRESS_FILE, progress)
+    success, counts = track_ingestor.ingest(session['user_id'], events)
     
     if success:
-        return jsonify({'success': True})
+        return jsonify({'success': True, **counts})
     else:
         return jsonify({'success': False, 'message': 'Logging failed'}), 500
 
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    return jsonify({
+        'success': True,
+        'counts': job_queue.stats(),
+        'jobs': job_queue.list(request.args.get('status'), limit)
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/model-versions', methods=['GET'])
+def model_versions():
+    return jsonify({'success': True, 'models': model_registry.versions()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/user-progress/<video_id>', methods=['GET'])
 def get_user_progress(video_id):
     if 'user_id' not in session:
         return jsonify({'success': False}), 401
     
     user_id = session['user_id']
-    progress = load_json(PROGRESS_FILE)
-    
-    user_progress = progress.get(user_id, {}).get(video_id, {})
+    user_progress = storage.get_video_progress(user_id, video_id)
     return jsonify({
         'success': True,
         'last_position': user_progress.get('last_position', 0),
@@ -240,22 +345,55 @@ def quiz_page(topic_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    videos = load_json(VIDEOS_FILE)
-    video = next((v for v in videos if v['id'] == topic_id), None)
+    video = catalog.get(topic_id)
     if not video:
         return redirect(url_for('dashboard'))
 
     user_id = session['user_id']
-    progress = load_json(PROGRESS_FILE)
-    user_video_progress = progress.get(user_id, {}).get(topic_id, {})
+    user_video_progress = storage.get_video_progress(user_id, topic_id)
     watch_time = user_video_progress.get('last_position', 0)
 
-    quiz = quiz_gen.generate_quiz(topic_id, video['title'], video['video_id'], watch_time)
+    quiz = quiz_gen.get_cached_quiz(topic_id, video['title'], video['video_id'], watch_time)
+    if quiz is None:
+        # Cold miss: render the page now and stream questions in as the LLM
+        # produces them.
+        pending = {'topic_id': topic_id, 'difficulty': 'medium', 'questions': []}
+        return render_template('quiz.html', quiz=pending,
+                               stream_url=url_for('quiz_stream', topic_id=topic_id))
     
-    session['current_quiz'] = quiz
+    # Only the handle goes into the cookie; questions and answers stay here.
+    session['quiz_handle'] = quiz_sessions.create(user_id, quiz)
     
     return render_template('quiz.html', quiz=quiz)
 
+@app.route('/quiz/<topic_id>/stream')
+def quiz_stream(topic_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    video = catalog.get(topic_id)
+    if not video:
+        return jsonify({'success': False, 'message': 'Unknown topic'}), 404
+
+    user_id = session['user_id']
+    watch_time = storage.get_video_progress(user_id, topic_id).get('last_position', 0)
+
+    # The session cookie goes out with the headers, before the quiz exists;
+    # the finished quiz is stored under the handle it already carries.
+    handle = quiz_sessions.new_handle()
+    session['quiz_handle'] = handle
+
+    def events():
+        for event, payload in quiz_gen.stream_quiz(topic_id, video['title'], video['video_id'], watch_time):
+            if event == 'done':
+                quiz_sessions.put(handle, user_id, payload)
+                payload = {'topic_id': payload['topic_id'], 'difficulty': payload['difficulty'],
+                           'count': len(payload['questions'])}
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 
 
 @app.route('/api/quiz-submit', methods=['POST'])
@@ -269,11 +407,11 @@ def quiz_submit():
     responses = data.get('responses', [])
     current_difficulty = data.get('difficulty', 'medium')
     
-    quiz = session.get('current_quiz')
+    quiz = quiz_sessions.get(session.get('quiz_handle'), user_id)
     if not quiz:
         return jsonify({'success': False, 'message': 'Quiz session expired. Please refresh the page.'}), 400
 
-    eval_result = evaluator.evaluate(quiz, responses)
+    eval_result = evaluator.evaluate(quiz, responses, user_id)
     if not eval_result:
         return jsonify({'success': False, 'message': 'Evaluation error'}), 500
     
@@ -285,14 +423,7 @@ def quiz_submit():
     is_correct_overall = score >= 70
     new_mastery = bkt_engine.update_mastery(user_id, topic_id, is_correct_overall)
     
-    try:
-        all_patterns = load_json('data/micro_patterns.json')
-        if not isinstance(all_patterns, list):
-            all_patterns = []
-        user_patterns = [p for p in all_patterns if p.get('user_id') == user_id and p.get('video_id') == topic_id]
-        latest_pattern = user_patterns[-1] if user_patterns else {}
-    except Exception:
-        latest_pattern = {}
+    latest_pattern = mp_manager.latest_pattern(user_id, topic_id)
     cluster = mp_manager.predict_cluster(latest_pattern)
     
     recommendation = recommender.get_recommendation(score, new_mastery, adaptation['speed_label'], cluster)
@@ -310,9 +441,9 @@ def quiz_submit():
         "recommendation": recommendation
     }
     
-    attempts = load_json(QUIZ_ATTEMPTS_FILE) if os.path.exists(QUIZ_ATTEMPTS_FILE) else []
-    attempts.append(attempt_log)
-    save_json(QUIZ_ATTEMPTS_FILE, attempts)
+    storage.add_attempt(attempt_log)
+    # A graded quiz cannot be submitted again; the handle is single-use.
+    quiz_sessions.discard(session.pop('quiz_handle', None))
     
     return jsonify({
         'success': True, 
@@ -321,8 +452,19 @@ def quiz_submit():
         'mastery': round(new_mastery, 2),
         'cluster': cluster,
         'results': eval_result['question_results'],
+        'feedback_id': eval_result.get('feedback_id'),
         'recommendation': recommendation
     })
 
+@app.route('/api/quiz-feedback/<feedback_id>', methods=['GET'])
+def quiz_feedback(feedback_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    feedback = evaluator.get_feedback(feedback_id, session['user_id'])
+    if feedback is None:
+        return jsonify({'success': False, 'message': 'Feedback not found'}), 404
+    return jsonify({'success': True, **feedback})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
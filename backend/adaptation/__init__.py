@@ -1,3 +1,4 @@
 from .micro_pattern import mp_manager
 from .speed_adaptation import speed_adapter
 from .recommendation import recommender
+from .tracking import track_ingestor
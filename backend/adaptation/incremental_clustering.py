@@ -0,0 +1,97 @@
+import json
+import os
+import numpy as np
+from backend.storage.atomic import atomic_write
+from backend.models.centroid_model import CentroidModel
+
+
+class IncrementalClusterer:
+    # Mini-batch k-means state checkpointed with the event-log offset it has
+    # consumed; counts are capped at max_count so centroids keep following drift.
+
+    def __init__(self, features, centroids, counts=None, offset=0, mean=None, scale=None,
+                 labels=None, model_version=None, max_count=50000):
+        self.features = list(features)
+        self.centroids = np.asarray(centroids, dtype=float)
+        k, n_features = self.centroids.shape
+        self.counts = np.zeros(k) if counts is None else np.asarray(counts, dtype=float)
+        self.offset = offset
+        self.mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=float)
+        self.scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=float)
+        self.labels = list(labels) if labels else None
+        self.model_version = model_version
+        self.max_count = max_count
+
+    @classmethod
+    def from_model(cls, model, offset=0, **kwargs):
+        return cls(model.features, model.centroids, offset=offset, mean=model.mean, scale=model.scale,
+                   labels=model.labels, **kwargs)
+
+    @classmethod
+    def from_sample(cls, features, X, k, seed=42, **kwargs):
+        # Cold start without a deployed model: k distinct records as seeds.
+        rng = np.random.default_rng(seed)
+        unique = np.unique(np.asarray(X, dtype=float), axis=0)
+        picks = rng.choice(len(unique), size=k, replace=False)
+        return cls(features, unique[picks], **kwargs)
+
+    def _transform(self, X):
+        return (np.atleast_2d(np.asarray(X, dtype=float)) - self.mean) / self.scale
+
+    def assign(self, X):
+        X = self._transform(X)
+        distances = (self.centroids ** 2).sum(axis=1) - 2 * X @ self.centroids.T
+        return X, distances.argmin(axis=1)
+
+    def count(self, X):
+        # Attributes records to the current centroids without moving them.
+        _, assignments = self.assign(X)
+        self.counts = np.minimum(self.counts + np.bincount(assignments, minlength=len(self.centroids)),
+                                 self.max_count)
+
+    def partial_fit(self, X):
+        X, assignments = self.assign(X)
+        k = len(self.centroids)
+        batch_counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, assignments, X)
+        for c in np.nonzero(batch_counts)[0]:
+            total = self.counts[c] + batch_counts[c]
+            self.centroids[c] = (self.centroids[c] * self.counts[c] + sums[c]) / total
+            self.counts[c] = min(total, self.max_count)
+        return self
+
+    def to_model(self, labels=None):
+        return CentroidModel(self.features, self.centroids, mean=self.mean, scale=self.scale,
+                             labels=labels or self.labels)
+
+    def to_dict(self):
+        return {
+            "features": self.features,
+            "centroids": self.centroids.tolist(),
+            "counts": self.counts.tolist(),
+            "offset": self.offset,
+            "scaling": {"mean": self.mean.tolist(), "scale": self.scale.tolist()},
+            "labels": self.labels,
+            "model_version": self.model_version,
+            "max_count": self.max_count
+        }
+
+    def save(self, path):
+        with atomic_write(path) as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Clustering checkpoint unreadable, starting over: {e}")
+            return None
+        scaling = data.get("scaling", {})
+        return cls(data["features"], data["centroids"], counts=data.get("counts"), offset=data.get("offset", 0),
+                   mean=scaling.get("mean"), scale=scaling.get("scale"), labels=data.get("labels"),
+                   model_version=data.get("model_version"), max_count=data.get("max_count", 50000))
@@ -1,25 +1,48 @@
-import json
 import os
+import threading
 from datetime import datetime
 import numpy as np
-import pandas as pd
-try:
-    from sklearn.cluster import KMeans
-    import pickle
-except ImportError:
-    KMeans = None
+from backend.storage.event_log import SegmentedEventLog, LatestIndex
+from backend.storage.file_lock import file_lock
+from backend.models.registry import model_registry, save_pickle_atomic
+from backend.models.centroid_model import CentroidModel, match_labels, FEATURES, CLUSTER_LABELS
+from backend.jobs.job_queue import job_queue
+from utils.metrics import timed_stage
+from .incremental_clustering import IncrementalClusterer
 
 class MicroPatternManager:
-    def __init__(self, storage_path='data/micro_patterns.json', model_path='models/clustering_model.pkl'):
-        self.storage_path = storage_path
+    def __init__(self, log_dir='data/micro_patterns', legacy_path='data/micro_patterns.json',
+                 model_path='models/clustering_model.pkl', centroids_path='models/clustering_centroids.json',
+                 checkpoint_path='models/clustering_checkpoint.json', retrain_every=500, chunk_size=1024):
+        self.log_dir = log_dir
+        self.legacy_path = legacy_path
         self.model_path = model_path
+        self.centroids_path = centroids_path
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
         os.makedirs('models', exist_ok=True)
+        self.event_log = SegmentedEventLog(log_dir)
+        self.latest_index = LatestIndex(self.event_log, lambda p: (p.get('user_id'), p.get('video_id')))
+        model_registry.register('clustering', centroids_path, loader=CentroidModel.load)
+        # Clustering retrains on a job worker once retrain_every new
+        # interactions have been logged, never on the request path.
+        job_queue.register('train_clustering', self._train_job, max_attempts=2)
+        job_queue.add_trigger('micro_patterns', retrain_every, 'train_clustering')
         self._ensure_storage()
+        # Index the existing history now rather than on the first quiz submit.
+        threading.Thread(target=self.latest_index.refresh, name='micro-pattern-index', daemon=True).start()
 
     def _ensure_storage(self):
-        if not os.path.exists(self.storage_path):
-            with open(self.storage_path, 'w') as f:
-                json.dump([], f)
+        # One-time import of the old whole-file JSON array into the log. The
+        # lock keeps workers that start together from importing it twice.
+        if not os.path.exists(self.legacy_path):
+            return
+        with file_lock(os.path.join(self.log_dir, '.import.lock')):
+            if not self.event_log.is_empty():
+                return
+            imported = self.event_log.import_json_array(self.legacy_path)
+            if imported:
+                print(f"Imported {imported} micro-pattern records from {self.legacy_path}")
 
     def log_interaction(self, user_id, video_id, interaction_data):
         log_entry = {
@@ -29,59 +52,145 @@ class MicroPatternManager:
             **interaction_data
         }
         try:
-            with open(self.storage_path, 'r+') as f:
-                data = json.load(f)
-                data.append(log_entry)
-                f.seek(0)
-                json.dump(data, f, indent=4)
-                f.truncate()
+            self.event_log.append(log_entry)
+            job_queue.bump('micro_patterns')
             return True
         except Exception as e:
             print(f"Error logging micro-pattern: {e}")
             return False
 
-    def train_model(self):
-        if not KMeans or not os.path.exists(self.storage_path):
+    def log_interactions(self, user_id, interactions):
+        # interactions is a list of (video_id, interaction_data); the whole
+        # batch is a single append to the event log.
+        timestamp = datetime.now().isoformat()
+        entries = [
+            {"user_id": user_id, "video_id": video_id, "timestamp": timestamp, **interaction_data}
+            for video_id, interaction_data in interactions
+        ]
+        try:
+            self.event_log.append_many(entries)
+            job_queue.bump('micro_patterns', len(entries))
+            return True
+        except Exception as e:
+            print(f"Error logging micro-patterns: {e}")
             return False
-        with open(self.storage_path, 'r') as f:
-            data = json.load(f)
-        if len(data) < 5:
+
+    def iter_patterns(self):
+        return self.event_log.iter_records()
+
+    def latest_pattern(self, user_id, video_id):
+        try:
+            record = self.latest_index.get((user_id, video_id))
+        except Exception as e:
+            print(f"Error reading micro-patterns: {e}")
+            record = None
+        return record or {}
+
+    def _chunks(self, offset):
+        # (features, end_offset) per chunk_size records after offset, so
+        # incremental training holds one chunk in memory at a time.
+        rows = []
+        end = offset
+        for record, end in self.event_log.iter_from(offset):
+            rows.append([record.get(f, 0) or 0 for f in FEATURES])
+            if len(rows) >= self.chunk_size:
+                yield np.array(rows, dtype=float), end
+                rows = []
+        if rows:
+            yield np.array(rows, dtype=float), end
+
+    def train_model(self, incremental=False):
+        if incremental:
+            return self._train_incremental()
+        # scikit-learn is only needed for full training, not for predict_cluster.
+        try:
+            from sklearn.cluster import KMeans
+        except ImportError:
             return False
-        
-        df = pd.DataFrame(data)
-        features = ['pause_count', 'rewatch_count', 'skip_ratio', 'watch_percentage']
-        X = df[features]
-        
+        X = np.array([[p.get(f, 0) for f in FEATURES] for p in self.iter_patterns()], dtype=float)
+        if len(X) < 5:
+            return False
+
         kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
         kmeans.fit(X)
-        with open(self.model_path, 'wb') as f:
-            pickle.dump(kmeans, f)
+        model = CentroidModel.from_estimator(kmeans, FEATURES)
+        model.labels = match_labels(model, model_registry.get('clustering'), CLUSTER_LABELS)
+        save_pickle_atomic(kmeans, self.model_path)
+        model.save(self.centroids_path)
+        model_registry.reload('clustering')
         return True
 
+    def _train_incremental(self):
+        deployed = model_registry.get('clustering')
+        version = model_registry.version('clustering')
+        state = IncrementalClusterer.load(self.checkpoint_path)
+
+        if deployed is not None and (state is None or state.model_version != version):
+            # The deployed centroids were not produced from this checkpoint
+            # (first run, or a full retrain since): adopt them and attribute
+            # the history they were trained on, then continue from the end.
+            state = IncrementalClusterer.from_model(deployed, model_version=version)
+            for X, end in self._chunks(0):
+                state.count(X)
+                state.offset = end
+            state.save(self.checkpoint_path)
+            return False
+
+        if state is None:
+            first = next(self._chunks(0), None)
+            if first is None or len(np.unique(first[0], axis=0)) < 3:
+                return False
+            state = IncrementalClusterer.from_sample(FEATURES, first[0], 3)
+
+        consumed = 0
+        for X, end in self._chunks(state.offset):
+            state.partial_fit(X)
+            state.offset = end
+            consumed += len(X)
+        if not consumed:
+            return False
+
+        model = state.to_model()
+        model.labels = match_labels(model, deployed, CLUSTER_LABELS)
+        model.save(self.centroids_path)
+        model_registry.reload('clustering')
+        state.labels = model.labels
+        state.model_version = model_registry.version('clustering')
+        state.save(self.checkpoint_path)
+        return True
+
+    def _train_job(self, payload):
+        trained = self.train_model(incremental=payload.get('incremental', True))
+        return {"trained": trained, "version": self.model_version()}
+
+    def model_version(self):
+        return model_registry.version('clustering')
+
+    @timed_stage('predict_cluster')
     def predict_cluster(self, interaction_data):
-        if not os.path.exists(self.model_path):
+        model = model_registry.get('clustering')
+        if model is None:
             return "General Learner"
-        
+
         try:
-            with open(self.model_path, 'rb') as f:
-                model = pickle.load(f)
-            
             vec = [
                 interaction_data.get('pause_count', 0),
                 interaction_data.get('rewatch_count', 0),
                 interaction_data.get('skip_ratio', 0),
                 interaction_data.get('watch_percentage', 0)
             ]
-            
-            prediction = model.predict([vec])[0]
-            labels = {
-                0: "Steady Learner",
-                1: "Detail-Oriented",
-                2: "Fast-Paced"
-            }
-            return labels.get(prediction, "General Learner")
+
+            prediction = model.predict_one(vec)
+            return model.label_for(prediction, CLUSTER_LABELS) or "General Learner"
         except Exception as e:
             print(f"Clustering prediction error: {e}")
             return "General Learner"
 
+    def predict_clusters(self, patterns):
+        model = model_registry.get('clustering')
+        if model is None:
+            return ["General Learner"] * len(patterns)
+        predictions = model.predict(model.vectorize(patterns))
+        return [model.label_for(int(p), CLUSTER_LABELS) or "General Learner" for p in predictions]
+
 mp_manager = MicroPatternManager()
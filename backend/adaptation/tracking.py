@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from backend.storage.store import storage
+from backend.models.centroid_model import FEATURES
+from .micro_pattern import mp_manager
+
+MAX_BATCH_EVENTS = 500
+
+
+def bad_topic_id(event):
+    # Lists or objects as topic_id cannot key the coalesced batch.
+    topic_id = event.get('topic_id') if isinstance(event, dict) else None
+    return topic_id is not None and (isinstance(topic_id, bool) or not isinstance(topic_id, (str, int)))
+
+
+class TrackIngestor:
+    # Coalesces tracking snapshots into one progress write and at most one
+    # micro-pattern record per (user, video).
+
+    def __init__(self, patterns=None, store=None, memory_size=10000):
+        self.patterns = patterns or mp_manager
+        self.storage = store or storage
+        self.memory_size = memory_size
+        self._last_logged = OrderedDict()
+        self._lock = threading.Lock()
+
+    def coalesce(self, events):
+        # The page buffers snapshots in the order it took them, so the last
+        # one per video is taken whole; mixing fields from different
+        # snapshots could describe a state the player was never in. Videos
+        # stay ordered by their newest snapshot.
+        latest = {}
+        for event in events:
+            if not isinstance(event, dict) or not event.get('topic_id') or bad_topic_id(event):
+                continue
+            latest.pop(event['topic_id'], None)
+            latest[event['topic_id']] = event
+        return latest
+
+    def _is_new(self, user_id, video_id, features):
+        with self._lock:
+            return self._last_logged.get((user_id, video_id)) != features
+
+    def _remember(self, user_id, interactions):
+        with self._lock:
+            for video_id, interaction_data in interactions:
+                key = (user_id, video_id)
+                self._last_logged[key] = tuple(interaction_data.values())
+                self._last_logged.move_to_end(key)
+            while len(self._last_logged) > self.memory_size:
+                self._last_logged.popitem(last=False)
+
+    def ingest(self, user_id, events):
+        # After an outage the page resends failed batches ahead of new ones,
+        # so the cap applies after coalescing and keeps the newest videos.
+        latest = self.coalesce(events)
+        latest = dict(list(latest.items())[-MAX_BATCH_EVENTS:])
+        now = datetime.now().isoformat()
+        interactions = []
+        progress = {}
+        for video_id, event in latest.items():
+            interaction_data = {f: event.get(f, 0) for f in FEATURES}
+            if self._is_new(user_id, video_id, tuple(interaction_data.values())):
+                interactions.append((video_id, interaction_data))
+            progress[video_id] = {
+                "last_position": event.get('last_time', 0),
+                "watch_percentage": event.get('watch_percentage', 0),
+                "timestamp": now
+            }
+
+        success = True
+        if interactions:
+            success = self.patterns.log_interactions(user_id, interactions)
+            if success:
+                self._remember(user_id, interactions)
+        if progress:
+            self.storage.set_progress_many(user_id, progress)
+        return success, {"accepted": len(events), "videos": len(progress), "logged": len(interactions)}
+
+
+track_ingestor = TrackIngestor()
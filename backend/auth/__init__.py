@@ -0,0 +1,2 @@
+# Backend Auth Module
+from .auth_service import auth_service
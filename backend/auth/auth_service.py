@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import hmac
+import os
+from datetime import datetime
+from backend.storage.base import normalize_email
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+DEFAULT_ITERATIONS = 240000
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS, salt=None):
+    # "pbkdf2_sha256$<iterations>$<salt>$<digest>", so the cost can be raised
+    # later and older hashes still verify.
+    salt = salt or base64.b64encode(os.urandom(16)).decode('ascii').rstrip('=')
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('ascii'), iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt}${base64.b64encode(digest).decode('ascii').rstrip('=')}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(HASH_ALGORITHM + '$')
+
+
+def verify_password(password, stored):
+    if not is_hashed(stored):
+        # Records created before hashing hold the password itself.
+        return hmac.compare_digest(str(stored or '').encode('utf-8'), password.encode('utf-8'))
+    try:
+        _, iterations, salt, _ = stored.split('$')
+        expected = hash_password(password, int(iterations), salt)
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected.encode('ascii'), stored.encode('ascii'))
+
+
+class AuthService:
+    # Registration and login over the keyed user directory; plaintext passwords
+    # from older records are rehashed on the next successful login.
+
+    def __init__(self, store=None, iterations=DEFAULT_ITERATIONS):
+        self._store = store
+        self.iterations = iterations
+        # Unknown emails are checked against this so a failed login costs
+        # the same whether or not the account exists.
+        self._dummy_hash = hash_password('edubox-dummy-password', iterations)
+
+    @property
+    def storage(self):
+        # The app's store is opened on first use, so scripts can import this
+        # module without creating or migrating data/ in their working dir.
+        if self._store is None:
+            from backend.storage.store import storage
+            self._store = storage
+        return self._store
+
+    def register(self, name, email, password):
+        if not isinstance(email, str) or not isinstance(password, str):
+            return None, 'Email and password are required'
+        if not email.strip() or not password:
+            return None, 'Email and password are required'
+        if name is not None and not isinstance(name, str):
+            return None, 'Name must be text'
+        if self.storage.get_user_by_email(email):
+            return None, 'Email already registered'
+
+        new_user = {
+            'id': self.storage.allocate_user_id(),
+            'name': name,
+            'email': email.strip(),
+            'password': hash_password(password, self.iterations),
+            'created_at': datetime.now().isoformat()
+        }
+        if not self.storage.add_user(new_user):
+            return None, 'Email already registered'
+        return new_user, None
+
+    def authenticate(self, email, password):
+        if not isinstance(email, str) or not isinstance(password, str) or not email:
+            return None
+        user = self.storage.get_user_by_email(normalize_email(email))
+        if user is None:
+            verify_password(password, self._dummy_hash)
+            return None
+        if not verify_password(password, user.get('password')):
+            return None
+
+        if not self._is_current(user.get('password')):
+            user['password'] = hash_password(password, self.iterations)
+            try:
+                self.storage.update_user(user)
+            except Exception as e:
+                print(f"Password rehash failed for user {user['id']}: {e}")
+        return user
+
+    def _is_current(self, stored):
+        return is_hashed(stored) and stored.split('$')[1] == str(self.iterations)
+
+
+auth_service = AuthService()
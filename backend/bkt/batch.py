@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def bkt_step(p_known, correct, p_learn, p_guess, p_slip):
+    # Array form of BKTEngine.update_mastery. The arithmetic is written in
+    # the same order as the scalar path so both give bit-identical results.
+    ev_correct = (p_known * (1 - p_slip)) / \
+                 (p_known * (1 - p_slip) + (1 - p_known) * p_guess)
+    ev_wrong = (p_known * p_slip) / \
+               (p_known * p_slip + (1 - p_known) * (1 - p_guess))
+    p_known_ev = np.where(correct, ev_correct, ev_wrong)
+    return p_known_ev + (1 - p_known_ev) * p_learn
+
+
+def replay_observations(user_ids, concept_ids, correct, concept_params, priors=None, precision=None):
+    # Replays (user, concept, correct) observations in the given order and
+    # returns {(user_id, concept_id): mastery}, starting from the optional
+    # {user_id: {concept_id: mastery}} priors. Each (user, concept) chain is
+    # sequential, but different chains are independent, so step k of every
+    # chain is computed at once as one array operation.
+    correct = np.asarray(correct, dtype=bool)
+    if len(correct) == 0:
+        return {}
+
+    users, user_idx = np.unique(np.asarray(user_ids, dtype=str), return_inverse=True)
+    concepts, concept_idx = np.unique(np.asarray(concept_ids, dtype=str), return_inverse=True)
+    pair_code = user_idx.astype(np.int64) * len(concepts) + concept_idx
+
+    # One stable sort groups observations by (user, concept) chain while
+    # keeping their original order inside each chain.
+    order = np.argsort(pair_code, kind='stable')
+    sorted_codes = pair_code[order]
+    new_chain = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    starts = np.flatnonzero(new_chain)
+    counts = np.diff(np.r_[starts, len(sorted_codes)])
+    pair_idx = np.empty(len(order), dtype=np.int64)
+    pair_idx[order] = np.cumsum(new_chain) - 1
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - np.repeat(starts, counts)
+    pair_codes = sorted_codes[starts]
+    pair_user = pair_codes // len(concepts)
+    pair_concept = pair_codes % len(concepts)
+
+    # Per-concept parameters, broadcast to one value per chain.
+    table = np.array([
+        [concept_params(c)[name] for name in ('p_init', 'p_learn', 'p_guess', 'p_slip')]
+        for c in concepts
+    ], dtype=float)
+    p_init, p_learn, p_guess, p_slip = table[pair_concept].T
+
+    pair_users = users[pair_user].tolist()
+    pair_concepts = concepts[pair_concept].tolist()
+    state = p_init.copy()
+    if priors:
+        for i, (u, c) in enumerate(zip(pair_users, pair_concepts)):
+            prior = priors.get(u, {}).get(c)
+            if prior is not None:
+                state[i] = prior
+
+    by_step = np.argsort(rank, kind='stable')
+    step_bounds = np.searchsorted(rank[by_step], np.arange(counts.max() + 1))
+    for k in range(counts.max()):
+        obs = by_step[step_bounds[k]:step_bounds[k + 1]]
+        pairs = pair_idx[obs]
+        updated = bkt_step(state[pairs], correct[obs], p_learn[pairs], p_guess[pairs], p_slip[pairs])
+        if precision is not None:
+            updated = np.round(updated, precision)
+        state[pairs] = updated
+
+    return dict(zip(zip(pair_users, pair_concepts), state.tolist()))
+
+
+def concept_params_from_model(model):
+    # Extracts per-skill parameters from a fitted pyBKT model, as pickled by
+    # scripts/train_models.py.
+    try:
+        df = model.params().reset_index()
+    except Exception as e:
+        print(f"Could not read BKT model parameters: {e}")
+        return {}
+
+    names = {'prior': 'p_init', 'learns': 'p_learn', 'guesses': 'p_guess', 'slips': 'p_slip'}
+    params = {}
+    for row in df.itertuples(index=False):
+        name = names.get(row.param)
+        if name:
+            params.setdefault(str(row.skill), {})[name] = float(row.value)
+    return {skill: p for skill, p in params.items() if len(p) == len(names)}
@@ -1,58 +1,113 @@
 import json
 import os
+from .mastery_store import MasteryStore
+from .batch import replay_observations, concept_params_from_model
+from backend.models.registry import model_registry
+from utils.metrics import timed_stage
 
 class BKTEngine:
-    def __init__(self, storage_path='data/bkt_states.json'):
+    def __init__(self, storage_path='data/bkt_states.json', model_path='models/bkt_model.pkl',
+                 flush_interval=5.0, flush_size=50, precision=4):
         self.storage_path = storage_path
+        self.model_path = model_path
         self.p_init = 0.3    
         self.p_learn = 0.2   
         self.p_guess = 0.2   
         self.p_slip = 0.1 
+        self.precision = precision
+        self.concept_overrides = {}
+        self._params_model = None
         self._ensure_storage()
+        self.store = MasteryStore(storage_path, flush_interval=flush_interval, flush_size=flush_size, precision=precision)
+        model_registry.register('bkt', model_path)
 
     def _ensure_storage(self):
         if not os.path.exists(self.storage_path):
             with open(self.storage_path, 'w') as f:
                 json.dump({}, f)
 
+    def concept_params(self, concept_id):
+        self.load_concept_params()
+        params = {
+            "p_init": self.p_init,
+            "p_learn": self.p_learn,
+            "p_guess": self.p_guess,
+            "p_slip": self.p_slip
+        }
+        params.update(self.concept_overrides.get(concept_id, {}))
+        return params
+
+    def set_concept_params(self, concept_params):
+        self.concept_overrides = dict(concept_params)
+
+    def load_concept_params(self):
+        # Follows the registry: per-concept parameters are re-read whenever a
+        # retrained model is swapped in, and kept while it stays the same.
+        model = model_registry.get('bkt')
+        if model is None or model is self._params_model:
+            return self.concept_overrides
+        self._params_model = model
+        params = concept_params_from_model(model)
+        if params:
+            self.set_concept_params(params)
+        return params
+
     def get_mastery(self, user_id, concept_id):
-        try:
-            with open(self.storage_path, 'r') as f:
-                states = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            states = {}
-        
-        user_state = states.get(user_id, {})
-        return user_state.get(concept_id, self.p_init)
+        return self.store.get(user_id, concept_id, self.concept_params(concept_id)['p_init'])
 
+    @timed_stage('bkt_update_mastery')
     def update_mastery(self, user_id, concept_id, is_correct):
-        p_known_prev = self.get_mastery(user_id, concept_id)
+        params = self.concept_params(concept_id)
+        # The store replays this step on the freshest prior when it flushes,
+        # so concurrent workers' updates compose rather than overwrite.
+        return self.store.update(
+            user_id, concept_id, lambda prior: self._posterior(prior, params, is_correct), params['p_init']
+        )
 
+    def _posterior(self, p_known_prev, params, is_correct):
+        p_learn, p_guess, p_slip = params['p_learn'], params['p_guess'], params['p_slip']
 
         if is_correct:
-            p_known_ev = (p_known_prev * (1 - self.p_slip)) / \
-                         (p_known_prev * (1 - self.p_slip) + (1 - p_known_prev) * self.p_guess)
+            p_known_ev = (p_known_prev * (1 - p_slip)) / \
+                         (p_known_prev * (1 - p_slip) + (1 - p_known_prev) * p_guess)
         else:
-            p_known_ev = (p_known_prev * self.p_slip) / \
-                         (p_known_prev * self.p_slip + (1 - p_known_prev) * (1 - self.p_guess))
-
-        p_known_new = p_known_ev + (1 - p_known_ev) * self.p_learn
-
-        self._save_state(user_id, concept_id, p_known_new)
-        return p_known_new
-
-    def _save_state(self, user_id, concept_id, mastery_prob):
-        try:
-            with open(self.storage_path, 'r') as f:
-                states = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            states = {}
-
-        if user_id not in states:
-            states[user_id] = {}
-        states[user_id][concept_id] = round(mastery_prob, 4)
-        
-        with open(self.storage_path, 'w') as f:
-            json.dump(states, f, indent=4)
+            p_known_ev = (p_known_prev * p_slip) / \
+                         (p_known_prev * p_slip + (1 - p_known_prev) * (1 - p_guess))
+
+        return p_known_ev + (1 - p_known_ev) * p_learn
+
+    def update_mastery_batch(self, observations, persist=True):
+        # observations: (user_id, concept_id, is_correct) tuples in time order,
+        # continuing from the currently stored mastery of each pair.
+        observations = list(observations)
+        if not observations:
+            return {}
+        user_ids, concept_ids, correct = zip(*observations)
+        result = replay_observations(user_ids, concept_ids, correct, self.concept_params,
+                                     priors=self.store.snapshot(), precision=self.precision)
+        if persist:
+            self.store.set_many((u, c, p) for (u, c), p in result.items())
+        return result
+
+    def replay(self, attempts, persist=False):
+        # Recomputes mastery from scratch over quiz attempt records, using the
+        # same correctness rule as quiz_submit (score >= 70).
+        attempts = sorted(attempts, key=lambda a: a.get('timestamp') or '')
+        attempts = [a for a in attempts if a.get('user_id') is not None and a.get('topic_id') is not None]
+        if not attempts:
+            return {}
+        result = replay_observations(
+            [a['user_id'] for a in attempts],
+            [a['topic_id'] for a in attempts],
+            [(a.get('score') or 0) >= 70 for a in attempts],
+            self.concept_params,
+            precision=self.precision
+        )
+        if persist:
+            self.store.set_many((u, c, p) for (u, c), p in result.items())
+        return result
+
+    def flush(self):
+        return self.store.flush()
 
 bkt_engine = BKTEngine()
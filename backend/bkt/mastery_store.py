@@ -0,0 +1,163 @@
+import atexit
+import json
+import os
+import threading
+import numpy as np
+from backend.storage.file_lock import file_lock
+from backend.storage.atomic import atomic_write
+
+
+class MasteryStore:
+    # Write-behind cache of bkt_states.json. A flush replays pending updates on
+    # the on-disk value under the exclusive lock, so concurrent workers compose.
+
+    def __init__(self, storage_path, flush_interval=5.0, flush_size=50, precision=4):
+        self.storage_path = storage_path
+        self.lock_path = storage_path + '.lock'
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.precision = precision
+        self._states = None
+        self._dirty = {}
+        self._mtime = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    def _read_file(self):
+        try:
+            with open(self.storage_path, 'r') as f:
+                states = json.load(f)
+            return states if isinstance(states, dict) else {}
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.storage_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _apply_pending(self, states):
+        # _dirty maps (user, concept) -> (default, [operation, ...]); each
+        # operation takes the previous probability and returns the next.
+        for (user_id, concept_id), (default, operations) in self._dirty.items():
+            value = states.get(user_id, {}).get(concept_id, default)
+            for operation in operations:
+                value = self._round(operation(value))
+            states.setdefault(user_id, {})[concept_id] = value
+        return states
+
+    def _load(self):
+        with file_lock(self.lock_path, shared=True):
+            self._mtime = self._file_mtime()
+            states = self._read_file()
+        self._states = self._apply_pending(states)
+
+    def _ensure_loaded(self):
+        if self._states is None:
+            self._load()
+            self._start_flusher()
+
+    def get(self, user_id, concept_id, default=None):
+        with self._lock:
+            self._ensure_loaded()
+            return self._states.get(user_id, {}).get(concept_id, default)
+
+    def get_user(self, user_id):
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._states.get(user_id, {}))
+
+    def snapshot(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {user_id: dict(concepts) for user_id, concepts in self._states.items()}
+
+    def _round(self, value):
+        # np.round, not round(): the batch replay rounds arrays with it, and
+        # the two disagree on ties.
+        return value if self.precision is None else float(np.round(value, self.precision))
+
+    def _set_locked(self, user_id, concept_id, value):
+        # An absolute write replaces whatever was pending for the key.
+        value = self._round(value)
+        self._states.setdefault(user_id, {})[concept_id] = value
+        self._dirty[(user_id, concept_id)] = (value, [lambda _: value])
+        return value
+
+    def set(self, user_id, concept_id, value):
+        with self._lock:
+            self._ensure_loaded()
+            value = self._set_locked(user_id, concept_id, value)
+            pending = len(self._dirty)
+        if pending >= self.flush_size:
+            self.flush()
+        return value
+
+    def set_many(self, items):
+        with self._lock:
+            self._ensure_loaded()
+            for user_id, concept_id, value in items:
+                self._set_locked(user_id, concept_id, value)
+        self.flush()
+
+    def update(self, user_id, concept_id, operation, default=None):
+        # Applies operation(prior) -> posterior now, and again at flush time
+        # on top of whatever other workers have written for the key since.
+        with self._lock:
+            self._ensure_loaded()
+            key = (user_id, concept_id)
+            value = self._round(operation(self._states.get(user_id, {}).get(concept_id, default)))
+            self._states.setdefault(user_id, {})[concept_id] = value
+            pending_default, operations = self._dirty.get(key, (default, []))
+            self._dirty[key] = (pending_default, operations + [operation])
+            pending = len(self._dirty)
+        if pending >= self.flush_size:
+            self.flush()
+        return value
+
+    def dirty_count(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return 0
+            with file_lock(self.lock_path):
+                states = self._apply_pending(self._read_file())
+                with atomic_write(self.storage_path) as f:
+                    json.dump(states, f, indent=4)
+                self._mtime = self._file_mtime()
+            flushed = len(self._dirty)
+            self._dirty.clear()
+            self._states = states
+            return flushed
+
+    def refresh(self):
+        # Pick up other workers' flushes when nothing local is pending.
+        with self._lock:
+            if self._states is not None and self._file_mtime() != self._mtime:
+                self._load()
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval:
+            self._flusher = threading.Thread(target=self._run_flusher, name='mastery-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                if self.flush() == 0:
+                    self.refresh()
+            except Exception as e:
+                print(f"Mastery flush error: {e}")
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Mastery flush error: {e}")
@@ -0,0 +1 @@
+from .job_queue import job_queue, JobQueue
@@ -0,0 +1,283 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from backend.storage.connection import sqlite_connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    dedupe_key TEXT,
+    run_after REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key, status);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    # Durable job queue on SQLite with retries and backoff. Running jobs hold a
+    # renewed lease; only jobs whose lease expired are recovered.
+
+    def __init__(self, db_path='data/jobs.db', poll_interval=0.5, retry_backoff=5.0, keep_finished=7 * 24 * 3600,
+                 lease_timeout=60.0):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.keep_finished = keep_finished
+        self.lease_timeout = lease_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}
+        self._triggers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._workers = []
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        # Databases created before leases existed lack the two columns.
+        columns = {row['name'] for row in self._conn().execute("PRAGMA table_info(jobs)")}
+        if 'owner' not in columns:
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if 'lease_until' not in columns:
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def register(self, name, handler, max_attempts=3):
+        # handler(payload) runs on a worker thread; its return value must be
+        # JSON serializable and an exception counts as a failed attempt.
+        self._handlers[name] = {"handler": handler, "max_attempts": max_attempts}
+
+    def add_trigger(self, counter, threshold, job_name, payload=None):
+        # Enqueue job_name each time `threshold` more events are counted
+        # against `counter` via bump().
+        self._triggers[counter] = {"threshold": threshold, "job": job_name, "payload": payload or {}}
+
+    def enqueue(self, name, payload=None, dedupe_key=None, delay=0):
+        # With a dedupe_key, a job already queued or running under that key
+        # is returned instead of adding a second one.
+        if name not in self._handlers:
+            raise ValueError(f"Unknown job: {name}")
+        now = datetime.now().isoformat()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                    (dedupe_key, *ACTIVE_STATUSES)
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row['id']
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, name, payload, status, max_attempts, dedupe_key, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, name, json.dumps(payload or {}), self._handlers[name]['max_attempts'],
+                 dedupe_key, time.time() + delay, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._wakeup.set()
+        return job_id
+
+    def bump(self, counter, amount=1):
+        trigger = self._triggers.get(counter)
+        if trigger is None or amount <= 0:
+            return None
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                (counter, amount)
+            )
+            value = conn.execute("SELECT value FROM counters WHERE name = ?", (counter,)).fetchone()['value']
+            fired = value >= trigger['threshold']
+            if fired:
+                conn.execute("UPDATE counters SET value = 0 WHERE name = ?", (counter,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if fired:
+            return self.enqueue(trigger['job'], trigger['payload'], dedupe_key=f"trigger:{counter}")
+        return None
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        if status:
+            rows = self._conn().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            )
+        else:
+            rows = self._conn().execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+        return [self._to_dict(row) for row in rows]
+
+    def stats(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def _claim(self):
+        now = datetime.now().isoformat()
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?, owner = ?, lease_until = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ? "
+            "ORDER BY run_after LIMIT 1) AND status = 'queued' RETURNING *",
+            (now, self.owner, time.time() + self.lease_timeout, time.time())
+        ).fetchone()
+
+    def _finish(self, job_id, status, result=None, error=None, run_after=None):
+        # Scoped to our own claim: if the lease lapsed and another process
+        # took the job over, its outcome wins.
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, run_after = COALESCE(?, run_after), updated_at = ?, "
+            "owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+            (status, json.dumps(result) if result is not None else None, error, run_after,
+             datetime.now().isoformat(), job_id, self.owner)
+        )
+
+    def run_pending(self, max_jobs=None):
+        # Runs ready jobs on the calling thread; workers loop over this.
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            row = self._claim()
+            if row is None:
+                break
+            self._run(row)
+            processed += 1
+        return processed
+
+    def _run(self, row):
+        entry = self._handlers.get(row['name'])
+        if entry is None:
+            self._finish(row['id'], 'failed', error=f"No handler registered for {row['name']}")
+            return
+        try:
+            result = entry['handler'](json.loads(row['payload']))
+            self._finish(row['id'], 'succeeded', result=result)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if row['attempts'] < row['max_attempts']:
+                backoff = self.retry_backoff * (2 ** (row['attempts'] - 1))
+                print(f"Job {row['name']} ({row['id']}) failed, retrying in {backoff:.0f}s: {error}")
+                self._finish(row['id'], 'queued', error=error, run_after=time.time() + backoff)
+            else:
+                print(f"Job {row['name']} ({row['id']}) failed after {row['attempts']} attempts: {error}")
+                traceback.print_exc()
+                self._finish(row['id'], 'failed', error=error)
+
+    def _renew_leases(self):
+        self._conn().execute(
+            "UPDATE jobs SET lease_until = ? WHERE status = 'running' AND owner = ?",
+            (time.time() + self.lease_timeout, self.owner)
+        )
+
+    def _recover(self):
+        # Requeues jobs whose owner stopped renewing their lease. A job that
+        # has used all its attempts fails instead, so one that keeps taking
+        # its process down is not reclaimed forever.
+        return self._conn().execute(
+            "UPDATE jobs SET owner = NULL, lease_until = NULL, updated_at = ?, "
+            "status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "error = CASE WHEN attempts >= max_attempts THEN 'Lease expired; out of attempts' "
+            "ELSE 'Lease expired; requeued' END "
+            "WHERE status = 'running' AND COALESCE(lease_until, 0) < ?",
+            (datetime.now().isoformat(), time.time())
+        ).rowcount
+
+    def prune(self):
+        cutoff = datetime.fromtimestamp(time.time() - self.keep_finished).isoformat()
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+        )
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_pending() == 0:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                time.sleep(self.poll_interval)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_timeout / 3):
+            try:
+                self._renew_leases()
+                if self._recover():
+                    self._wakeup.set()
+            except Exception as e:
+                print(f"Job heartbeat error: {e}")
+
+    def start(self, workers=2):
+        if self._workers or workers <= 0:
+            return
+        self._recover()
+        self.prune()
+        self._stop.clear()
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        thread.start()
+        self._workers.append(thread)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._workers:
+            thread.join(timeout)
+        self._workers = []
+
+
+job_queue = JobQueue()
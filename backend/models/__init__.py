@@ -0,0 +1,2 @@
+# Backend Models Module
+from .registry import model_registry
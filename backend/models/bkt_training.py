@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+
+def _fit_skill(task):
+    # Runs in a worker process: one pyBKT fit of one skill with one seed.
+    # The restart's log-likelihood on its own data decides which restart is
+    # kept, the same criterion pyBKT applies across num_fits.
+    import pandas as pd
+    from pyBKT.models import Model
+
+    skill, user_names, user_codes, correct, seed = task
+    df = pd.DataFrame({
+        'user_id': user_names[user_codes],
+        'skill_name': skill,
+        'correct': correct
+    })
+    model = Model(seed=seed, num_fits=1, parallel=False)
+    model.fit(data=df)
+    predicted = model.predict(data=df)['correct_predictions'].to_numpy(dtype=float)
+    predicted = np.clip(predicted, 1e-9, 1 - 1e-9)
+    log_likelihood = float(np.sum(correct * np.log(predicted) + (1 - correct) * np.log1p(-predicted)))
+    return skill, seed, log_likelihood, model
+
+
+def partition_by_skill(users, skills, user_col, skill_col, correct_col, restarts=1, seed=42):
+    # One task per (skill, restart), each carrying only that skill's rows in
+    # their original order and the names of the users that appear in them.
+    users = np.asarray(users, dtype=object)
+    order = np.argsort(skill_col, kind='stable')
+    sorted_skills = skill_col[order]
+    bounds = np.flatnonzero(np.diff(sorted_skills)) + 1
+    tasks = []
+    for rows in np.split(order, bounds):
+        if not len(rows):
+            continue
+        present, local_codes = np.unique(user_col[rows], return_inverse=True)
+        skill = skills[int(skill_col[rows[0]])]
+        correct = correct_col[rows].astype(np.int8)
+        for restart in range(restarts):
+            tasks.append((skill, users[present], local_codes, correct, seed + restart))
+    # Largest skills first so one long fit does not start last.
+    tasks.sort(key=lambda task: len(task[3]), reverse=True)
+    return tasks
+
+
+def train_skills_parallel(users, skills, user_col, skill_col, correct_col, workers=None, restarts=1, seed=42):
+    # Fits every skill (and every restart of it) as an independent pyBKT
+    # model across a process pool, keeps the best restart per skill, and
+    # merges the per-skill parameters into a single model whose params()
+    # covers all skills, as one Model.fit over the whole dataset would.
+    workers = workers or os.cpu_count() or 1
+    tasks = partition_by_skill(users, skills, user_col, skill_col, correct_col, restarts, seed)
+
+    best = {}
+    def keep(result):
+        skill, fit_seed, log_likelihood, model = result
+        if skill not in best or log_likelihood > best[skill]['log_likelihood']:
+            best[skill] = {"seed": fit_seed, "log_likelihood": log_likelihood, "model": model}
+
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            try:
+                keep(_fit_skill(task))
+            except Exception as e:
+                print(f"BKT fit failed for skill {task[0]} (seed {task[4]}): {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = {pool.submit(_fit_skill, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    keep(future.result())
+                except Exception as e:
+                    print(f"BKT fit failed for skill {task[0]} (seed {task[4]}): {e}")
+
+    merged = None
+    summary = {}
+    for skill in sorted(best):
+        model = best[skill]["model"]
+        if merged is None:
+            merged = model
+        else:
+            merged.fit_model.update(model.fit_model)
+        summary[skill] = {
+            "rows": next(len(t[3]) for t in tasks if t[0] == skill),
+            "seed": best[skill]["seed"],
+            "log_likelihood": best[skill]["log_likelihood"]
+        }
+    return merged, summary
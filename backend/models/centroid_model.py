@@ -0,0 +1,90 @@
+import json
+from itertools import permutations
+import numpy as np
+from backend.storage.atomic import atomic_write
+
+FEATURES = ['pause_count', 'rewatch_count', 'skip_ratio', 'watch_percentage']
+CLUSTER_LABELS = {
+    0: "Steady Learner",
+    1: "Detail-Oriented",
+    2: "Fast-Paced"
+}
+
+
+class CentroidModel:
+    # Nearest-centroid inference from exported KMeans arrays, so web workers
+    # can predict without scikit-learn.
+
+    def __init__(self, features, centroids, mean=None, scale=None, labels=None):
+        self.features = list(features)
+        self.labels = list(labels) if labels else None
+        self.centroids = np.asarray(centroids, dtype=float)
+        n_features = len(self.features)
+        self.mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=float)
+        self.scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=float)
+        self._centroid_sq = (self.centroids ** 2).sum(axis=1)
+
+    @classmethod
+    def from_estimator(cls, kmeans, features, scaler=None, labels=None):
+        mean = getattr(scaler, 'mean_', None) if scaler is not None else None
+        scale = getattr(scaler, 'scale_', None) if scaler is not None else None
+        return cls(features, kmeans.cluster_centers_, mean=mean, scale=scale, labels=labels)
+
+    def vectorize(self, records):
+        return np.array([[r.get(f, 0) or 0 for f in self.features] for r in records], dtype=float)
+
+    def predict(self, X):
+        X = (np.atleast_2d(np.asarray(X, dtype=float)) - self.mean) / self.scale
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2; |x|^2 does not change the argmin.
+        distances = self._centroid_sq - 2 * X @ self.centroids.T
+        return distances.argmin(axis=1)
+
+    def predict_one(self, vec):
+        return int(self.predict([vec])[0])
+
+    @property
+    def raw_centroids(self):
+        return self.centroids * self.scale + self.mean
+
+    def label_for(self, index, default_labels):
+        if self.labels is not None and 0 <= index < len(self.labels):
+            return self.labels[index]
+        return default_labels.get(index)
+
+    def to_dict(self):
+        data = {
+            "features": self.features,
+            "centroids": self.centroids.tolist(),
+            "scaling": {"mean": self.mean.tolist(), "scale": self.scale.tolist()}
+        }
+        if self.labels is not None:
+            data["labels"] = self.labels
+        return data
+
+    def save(self, path):
+        with atomic_write(path) as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        scaling = data.get("scaling", {})
+        return cls(data["features"], data["centroids"], mean=scaling.get("mean"), scale=scaling.get("scale"),
+                   labels=data.get("labels"))
+
+
+def match_labels(model, reference, default_labels):
+    # Names new centroids after the nearest centroids of the reference model
+    # (the one being replaced), choosing the one-to-one assignment with the
+    # least total squared distance. Cluster indices are arbitrary per fit, so
+    # this is what keeps "Fast-Paced" meaning the same behaviour across
+    # retrains.
+    centroids = model.raw_centroids
+    k = len(centroids)
+    if reference is None or len(reference.centroids) != k:
+        return [default_labels.get(i, f"Cluster {i}") for i in range(k)]
+    ref_labels = [reference.label_for(i, default_labels) or f"Cluster {i}" for i in range(k)]
+    cost = ((centroids[:, None, :] - reference.raw_centroids[None, :, :]) ** 2).sum(axis=2)
+    best = min(permutations(range(k)), key=lambda perm: sum(cost[i, perm[i]] for i in range(k)))
+    return [ref_labels[best[i]] for i in range(k)]
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from backend.storage.atomic import atomic_write
+
+
+def pickle_loader(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_pickle_atomic(obj, path):
+    with atomic_write(path, 'wb') as f:
+        pickle.dump(obj, f)
+
+
+class ModelRegistry:
+    # Trained artifacts held in memory and reloaded when their file changes.
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, loader=pickle_loader):
+        with self._lock:
+            self._entries[name] = {
+                "path": path,
+                "loader": loader,
+                "model": None,
+                "signature": None,
+                "version": None,
+                "loaded_at": None,
+                "checked_at": 0.0,
+                "error": None
+            }
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _version(self, path):
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+
+        now = time.monotonic()
+        if entry["model"] is not None and now - entry["checked_at"] < self.check_interval:
+            return entry["model"]
+
+        signature = self._signature(entry["path"])
+        entry["checked_at"] = now
+        if signature == entry["signature"]:
+            return entry["model"]
+        return self._load(name, signature)
+
+    def reload(self, name):
+        entry = self._entries[name]
+        return self._load(name, self._signature(entry["path"]))
+
+    def _load(self, name, signature):
+        entry = self._entries[name]
+        if signature is None:
+            with self._lock:
+                entry.update(model=None, signature=None, version=None, loaded_at=None, error=None)
+            return None
+
+        try:
+            model = entry["loader"](entry["path"])
+            version = self._version(entry["path"])
+        except Exception as e:
+            print(f"Model load error for {name}: {e}")
+            with self._lock:
+                entry.update(signature=signature, error=str(e))
+            return entry["model"]
+
+        with self._lock:
+            entry.update(
+                model=model,
+                signature=signature,
+                version=version,
+                loaded_at=datetime.now().isoformat(),
+                error=None
+            )
+        return model
+
+    def version(self, name):
+        return self._entries[name]["version"]
+
+    def versions(self):
+        with self._lock:
+            return {
+                name: {
+                    "path": entry["path"],
+                    "version": entry["version"],
+                    "loaded_at": entry["loaded_at"],
+                    "error": entry["error"]
+                }
+                for name, entry in self._entries.items()
+            }
+
+
+model_registry = ModelRegistry()
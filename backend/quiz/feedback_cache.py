@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from backend.storage.connection import sqlite_connect
+
+
+class FeedbackCache:
+    # LLM grading output keyed by a hash of its normalized inputs: an in-memory
+    # LRU in front of SQLite, both capped.
+
+    def __init__(self, db_path='data/llm_cache.db', memory_size=2048, max_entries=100000):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache (last_used)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(kind, *parts):
+        payload = json.dumps([kind, *parts], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+
+        try:
+            row = self._conn().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Feedback cache read error: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value)
+            self.hits += 1
+        try:
+            self._conn().execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error:
+            pass
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self._puts += 1
+            check_size = self._puts % 100 == 0
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            if check_size:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Feedback cache write error: {e}")
+
+    def _evict(self, conn):
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from backend.storage.connection import sqlite_connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_feedback (
+    feedback_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    feedback TEXT,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (feedback_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_feedback_expires ON quiz_feedback (expires_at);
+"""
+
+
+class FeedbackStore:
+    # Background quiz explanations in SQLite, so any worker can answer the poll;
+    # scoped to the user and expiring after ttl.
+
+    def __init__(self, db_path='data/quiz_feedback.db', ttl=600, purge_interval=300):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = time.time()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def create(self, feedback_id, user_id, question_ids):
+        expires_at = time.time() + self.ttl
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO quiz_feedback (feedback_id, user_id, position, question_id, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(feedback_id, str(user_id), position, json.dumps(q_id), expires_at)
+                 for position, q_id in enumerate(question_ids)]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+
+    def fill(self, feedback_id, position, feedback):
+        self._conn().execute(
+            "UPDATE quiz_feedback SET feedback = ? WHERE feedback_id = ? AND position = ?",
+            (feedback, feedback_id, position)
+        )
+
+    def get(self, feedback_id, user_id):
+        rows = self._conn().execute(
+            "SELECT question_id, feedback FROM quiz_feedback "
+            "WHERE feedback_id = ? AND user_id = ? AND expires_at >= ? ORDER BY position",
+            (feedback_id, str(user_id), time.time())
+        ).fetchall()
+        if not rows:
+            return None
+        return {
+            "complete": all(feedback is not None for _, feedback in rows),
+            "results": [{"question_id": json.loads(q_id), "feedback": feedback} for q_id, feedback in rows]
+        }
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        self.purge(now)
+
+    def purge(self, now=None):
+        now = now or time.time()
+        return self._conn().execute("DELETE FROM quiz_feedback WHERE expires_at < ?", (now,)).rowcount
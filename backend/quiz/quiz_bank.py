@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from backend.storage.connection import sqlite_connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic_id TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    quiz TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_quizzes_key ON quizzes (topic_id, difficulty, bucket);
+CREATE INDEX IF NOT EXISTS idx_quizzes_last_used ON quizzes (last_used_at);
+"""
+
+
+class QuizBank:
+    # Pools of generated quizzes per (topic, difficulty, watch-position bucket),
+    # with ttl expiry and LRU eviction past max_entries.
+
+    def __init__(self, db_path='data/quiz_bank.db', bucket_seconds=300, pool_size=3,
+                 max_entries=1000, ttl=7 * 24 * 3600):
+        self.db_path = db_path
+        self.bucket_seconds = bucket_seconds
+        self.pool_size = pool_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def bucket_for(self, watch_time):
+        return int(max(watch_time or 0, 0) // self.bucket_seconds)
+
+    def bucket_start(self, bucket):
+        # Quizzes for a bucket only cover what every viewer in it has seen.
+        return bucket * self.bucket_seconds
+
+    def get(self, topic_id, difficulty, bucket):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT id, quiz FROM quizzes WHERE topic_id = ? AND difficulty = ? AND bucket = ? "
+            "AND created_at >= ? ORDER BY RANDOM() LIMIT 1",
+            (topic_id, difficulty, bucket, time.time() - self.ttl)
+        ).fetchone()
+        if not row:
+            return None
+        conn.execute(
+            "UPDATE quizzes SET last_used_at = ?, hits = hits + 1 WHERE id = ?", (time.time(), row[0])
+        )
+        return json.loads(row[1])
+
+    def count(self, topic_id, difficulty, bucket):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM quizzes WHERE topic_id = ? AND difficulty = ? AND bucket = ? AND created_at >= ?",
+            (topic_id, difficulty, bucket, time.time() - self.ttl)
+        ).fetchone()[0]
+
+    def needs_refill(self, topic_id, difficulty, bucket):
+        return self.count(topic_id, difficulty, bucket) < self.pool_size
+
+    def put(self, topic_id, difficulty, bucket, quiz):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO quizzes (topic_id, difficulty, bucket, quiz, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (topic_id, difficulty, bucket, json.dumps(quiz), now, now)
+        )
+        self.evict()
+
+    def evict(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM quizzes WHERE created_at < ?", (time.time() - self.ttl,))
+        excess = conn.execute("SELECT COUNT(*) FROM quizzes").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM quizzes WHERE id IN (SELECT id FROM quizzes ORDER BY last_used_at LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self):
+        total, hits = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM quizzes").fetchone()
+        return {"entries": total, "hits": hits}
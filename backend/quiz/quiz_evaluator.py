@@ -1,12 +1,63 @@
-import json
-import requests
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.llm_client import ollama_client
+from utils.metrics import timed_stage, record_llm_fallback
+from .feedback_cache import FeedbackCache
+from .feedback_store import FeedbackStore
+
+GRADING_MODES = ("local", "llm")
+
+def normalize_option(text):
+    if text is None:
+        return ""
+    return re.sub(r'\s+', ' ', str(text)).strip().strip('.').casefold()
+
+def valid_verdict(result):
+    # Only this shape is graded with or shared through the cache; anything
+    # else the model produced falls back to exact matching.
+    return (isinstance(result, dict) and isinstance(result.get('is_correct'), bool)
+            and isinstance(result.get('feedback'), str) and bool(result['feedback'].strip()))
 
 class QuizEvaluator:
-    def __init__(self, ollama_url="http://localhost:11434/api/generate"):
-        self.ollama_url = ollama_url
-        self.model = "llama3"
+    def __init__(self, client=None, max_concurrency=4,
+                 quiz_deadline=20.0, request_timeout=15, grading_mode="local",
+                 async_feedback=True, feedback_ttl=600, cache=None, feedback_store=None):
+        if grading_mode not in GRADING_MODES:
+            raise ValueError(f"Unknown grading mode: {grading_mode}")
+        self.client = client or ollama_client
+        self.cache = cache or FeedbackCache()
+        self.quiz_deadline = quiz_deadline
+        self.request_timeout = request_timeout
+        # "local" decides correctness by option matching and only asks the LLM
+        # for explanations in the background; "llm" grades through the LLM.
+        self.grading_mode = grading_mode
+        self.async_feedback = async_feedback
+        self.feedback = feedback_store or FeedbackStore(ttl=feedback_ttl)
+        # Shared by every quiz in the process, so max_concurrency caps the
+        # number of grading calls in flight against the LLM server.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='quiz-grader')
+
+    def _exact_match_result(self, selected, correct_answer):
+        is_correct = normalize_option(selected) == normalize_option(correct_answer)
+        return {
+            "is_correct": is_correct,
+            "feedback": "Great focus on the core concept!" if is_correct else "Review the key principles of this topic."
+        }
+
+    def _cache_key(self, kind, question, selected, correct_answer, *extra):
+        return FeedbackCache.make_key(
+            kind, self.client.model, normalize_option(question),
+            normalize_option(selected), normalize_option(correct_answer), *extra
+        )
+
+    def _ai_verify_and_explain(self, question, selected, correct_answer, timeout=None):
+        key = self._cache_key("verify", question, selected, correct_answer)
+        cached = self.cache.get(key)
+        if valid_verdict(cached):
+            return dict(cached)
 
-    def _ai_verify_and_explain(self, question, selected, correct_answer):
         prompt = f"""
         Question: {question}
         Student's Answer: {selected}
@@ -22,26 +73,89 @@ class QuizEvaluator:
             "feedback": "Your explanation here"
         }}
         """
-        try:
-            response = requests.post(self.ollama_url, json={
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json"
-            }, timeout=15)
-            
-            if response.status_code == 200:
-                return json.loads(response.json().get('response', '{}'))
-        except Exception as e:
-            print(f"AI Evaluation error: {e}")
+        result = self.client.generate(prompt, timeout=timeout or self.request_timeout)
+        record_llm_fallback('grading', int(not valid_verdict(result)))
+        if valid_verdict(result):
+            result = {"is_correct": result['is_correct'], "feedback": result['feedback'].strip()}
+            self.cache.put(key, result)
+            return result
         
-        is_correct = str(selected).strip().lower() == str(correct_answer).strip().lower()
-        return {
-            "is_correct": is_correct,
-            "feedback": "Great focus on the core concept!" if is_correct else "Review the key principles of this topic."
-        }
+        return self._exact_match_result(selected, correct_answer)
+
+    def _ai_explain(self, question, selected, correct_answer, is_correct, timeout=None):
+        key = self._cache_key("explain", question, selected, correct_answer, bool(is_correct))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
 
-    def evaluate(self, quiz, responses):
+        verdict = "correct" if is_correct else "incorrect"
+        prompt = f"""
+        Question: {question}
+        Student's Answer: {selected}
+        Correct Answer: {correct_answer}
+        The Student's Answer is {verdict}.
+        
+        Act as an expert tutor. Provide a 1-sentence supportive explanation of WHY it is {verdict}.
+        
+        Return the result ONLY as a JSON object with this structure:
+        {{
+            "feedback": "Your explanation here"
+        }}
+        """
+        result = self.client.generate(prompt, timeout=timeout or self.request_timeout)
+        if isinstance(result, dict) and isinstance(result.get('feedback'), str) and result['feedback'].strip():
+            self.cache.put(key, result['feedback'].strip())
+            return result['feedback'].strip()
+        return None
+
+    def _grade_all(self, items):
+        # Grades (question, selected, answer) items concurrently. Anything not
+        # finished by the per-quiz deadline falls back to exact matching.
+        deadline = time.monotonic() + self.quiz_deadline
+        timeout = min(self.request_timeout, self.quiz_deadline)
+        futures = [
+            self._executor.submit(self._ai_verify_and_explain, question, selected, answer, timeout)
+            for question, selected, answer in items
+        ]
+        wait(futures, timeout=max(0, deadline - time.monotonic()))
+
+        results = []
+        timed_out = 0
+        for future, (question, selected, answer) in zip(futures, items):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                results.append(future.result())
+            else:
+                future.cancel()
+                timed_out += 1
+                print("AI Evaluation timed out; using exact-match grading.")
+                results.append(self._exact_match_result(selected, answer))
+        record_llm_fallback('grading_deadline', timed_out, len(items))
+        return results
+
+    def _request_feedback(self, user_id, question_ids, items, graded):
+        # Queues LLM explanations for answers already graded locally; the
+        # student polls get_feedback(feedback_id, user_id) for the text as it
+        # arrives, from whichever worker answers the poll.
+        feedback_id = uuid.uuid4().hex
+        self.feedback.create(feedback_id, user_id, question_ids)
+
+        def explain(index, question, selected, answer, is_correct):
+            feedback = self._ai_explain(question, selected, answer, is_correct)
+            record_llm_fallback('feedback', int(feedback is None))
+            try:
+                self.feedback.fill(feedback_id, index, feedback or graded[index]['feedback'])
+            except Exception as e:
+                print(f"Feedback store error: {e}")
+
+        for index, ((question, selected, answer), result) in enumerate(zip(items, graded)):
+            self._executor.submit(explain, index, question, selected, answer, result['is_correct'])
+        return feedback_id
+
+    def get_feedback(self, feedback_id, user_id):
+        return self.feedback.get(feedback_id, user_id)
+
+    @timed_stage('quiz_evaluate')
+    def evaluate(self, quiz, responses, user_id=None):
         try:
             if not quiz:
                 return None
@@ -50,20 +164,32 @@ class QuizEvaluator:
             total_time = 0
             question_results = []
 
+            matched = []
             for resp in responses:
+                total_time += resp['time_taken']
+                question_data = next((q for q in quiz['questions'] if str(q['id']) == str(resp['question_id'])), None)
+                matched.append(question_data)
+
+            items = [
+                (q['text'], resp['selected_answer'], q['answer'])
+                for resp, q in zip(responses, matched) if q
+            ]
+            feedback_id = None
+            if self.grading_mode == "llm":
+                graded = self._grade_all(items)
+            else:
+                graded = [self._exact_match_result(selected, answer) for _, selected, answer in items]
+                if self.async_feedback and items and user_id is not None:
+                    question_ids = [resp['question_id'] for resp, q in zip(responses, matched) if q]
+                    feedback_id = self._request_feedback(user_id, question_ids, items, graded)
+            graded = iter(graded)
+
+            for resp, question_data in zip(responses, matched):
                 q_id = resp['question_id']
-                selected = resp['selected_answer']
                 time_taken = resp['time_taken']
-                total_time += time_taken
 
-                question_data = next((q for q in quiz['questions'] if str(q['id']) == str(q_id)), None)
-                
                 if question_data:
-                    ai_result = self._ai_verify_and_explain(
-                        question_data['text'], 
-                        selected, 
-                        question_data['answer']
-                    )
+                    ai_result = next(graded)
                     
                     is_correct = ai_result.get('is_correct', False)
                     if is_correct:
@@ -91,7 +217,8 @@ class QuizEvaluator:
                 "score": round(score, 2),
                 "avg_time": round(avg_time, 2),
                 "total_time": round(total_time, 2),
-                "question_results": question_results
+                "question_results": question_results,
+                "feedback_id": feedback_id
             }
         except Exception as e:
             print(f"Evaluation error: {e}")
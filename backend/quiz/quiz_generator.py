@@ -1,73 +1,115 @@
-import json
-import os
-import requests
+from utils.llm_client import ollama_client
+from backend.jobs.job_queue import job_queue
+from utils.metrics import metrics, timed_stage, record_llm_fallback
+from .quiz_bank import QuizBank
+from .transcript_cache import TranscriptCache, default_fetcher
+from .quiz_stream import QuestionStreamParser
 
 
 class QuizGenerator:
-    def __init__(self, ollama_url="http://localhost:11434/api/generate", model="llama3"):
-        self.ollama_url = ollama_url
-        self.model = model
-
-    def _get_transcript_text(self, youtube_id, watch_time):
-        if not youtube_id:
-            return None
-            
-        try:
-            from youtube_transcript_api import YouTubeTranscriptApi
-            
-            transcript_list = None
-            try:
-                try:
-                    transcript_list = YouTubeTranscriptApi.get_transcript(youtube_id)
-                except:
-                    pass
-                
-                if not transcript_list:
-                    try:
-                        transcript_list = YouTubeTranscriptApi().get_transcript(youtube_id)
-                    except:
-                        pass
-                
-                if not transcript_list:
-                    try:
-                        ts_obj = YouTubeTranscriptApi.list(youtube_id)
-                        transcript_list = ts_obj.find_transcript(['en']).fetch()
-                    except:
-                        try:
-                            ts_obj = YouTubeTranscriptApi().list(youtube_id)
-                            transcript_list = ts_obj.find_transcript(['en']).fetch()
-                        except:
-                            pass
-                
-                if not transcript_list:
-                    import youtube_transcript_api as yta
-                    if hasattr(yta, 'get_transcript'):
-                        transcript_list = yta.get_transcript(youtube_id)
-            except Exception as e:
-                print(f"Transcript strategies failed: {e}")
-
-            if not transcript_list or not isinstance(transcript_list, list):
-                return None
-
-            relevant_text = []
-            for entry in transcript_list:
-                if isinstance(entry, dict) and 'start' in entry and 'text' in entry:
-                    if entry['start'] <= watch_time:
-                        relevant_text.append(entry['text'])
-                    else:
-                        break
-            
-            return " ".join(relevant_text) if relevant_text else None
-        except Exception as e:
-            print(f"Transcript service error: {e}")
-            return None
-
-
+    def __init__(self, client=None, bank=None, transcripts=None, timeout=90, jobs=None):
+        self.client = client or ollama_client
+        self.timeout = timeout
+        self.bank = bank or QuizBank()
+        self.transcripts = transcripts or TranscriptCache(fetcher=default_fetcher())
+        self.jobs = jobs or job_queue
+        self.jobs.register('quiz_refill', self._refill_job)
+
+    def _get_transcript_text(self, youtube_id, watch_time, max_chars=None):
+        return self.transcripts.text_until(youtube_id, watch_time, max_chars)
+
+    def get_cached_quiz(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium"):
+        bucket = self.bank.bucket_for(watch_time)
+        quiz = self.bank.get(topic_id, difficulty, bucket)
+        if quiz is not None:
+            self.schedule_refill(topic_id, topic_name, youtube_id, difficulty, bucket)
+        return quiz
+
+    def stream_quiz(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium"):
+        # Yields ("question", question) as each question is parsed out of the
+        # LLM token stream, then ("done", quiz) with the assembled quiz.
+        bucket = self.bank.bucket_for(watch_time)
+        quiz = self.bank.get(topic_id, difficulty, bucket)
+        if quiz is None:
+            prompt = self._build_prompt(topic_id, topic_name, youtube_id, watch_time, difficulty)
+            parser = QuestionStreamParser()
+            questions = []
+            with metrics.timer('stage_duration_seconds', stage='quiz_stream'):
+                for chunk in self.client.generate_stream(prompt, timeout=self.timeout):
+                    for question in parser.feed(chunk):
+                        question.setdefault('id', len(questions) + 1)
+                        questions.append(question)
+                        yield "question", question
+
+            record_llm_fallback('quiz_stream', int(not questions))
+            if questions:
+                quiz = {"topic_id": topic_id, "difficulty": difficulty, "questions": questions}
+                if parser.complete:
+                    self._save_to_bank(topic_id, quiz, difficulty, watch_time)
+            else:
+                print("Quiz streaming unavailable. Using fallback quiz.")
+                quiz = self._get_fallback_quiz(topic_id, topic_name, difficulty)
+                for question in quiz['questions']:
+                    yield "question", question
+        else:
+            for question in quiz['questions']:
+                yield "question", question
 
+        self.schedule_refill(topic_id, topic_name, youtube_id, difficulty, bucket)
+        yield "done", quiz
 
+    def schedule_refill(self, topic_id, topic_name, youtube_id, difficulty, bucket):
+        if not self.bank.needs_refill(topic_id, difficulty, bucket):
+            return None
+        return self.jobs.enqueue('quiz_refill', {
+            "topic_id": topic_id,
+            "topic_name": topic_name,
+            "youtube_id": youtube_id,
+            "difficulty": difficulty,
+            "bucket": bucket
+        }, dedupe_key=f"quiz_refill:{topic_id}:{difficulty}:{bucket}")
+
+    def _refill_job(self, payload):
+        topic_id, difficulty, bucket = payload['topic_id'], payload['difficulty'], payload['bucket']
+        watch_time = self.bank.bucket_start(bucket)
+        generated = 0
+        for _ in range(self.bank.pool_size):
+            if not self.bank.needs_refill(topic_id, difficulty, bucket):
+                break
+            if self.generate_quiz(topic_id, payload['topic_name'], payload['youtube_id'], watch_time, difficulty,
+                                  fallback=False) is None:
+                # Raising hands the job back to the queue for a later retry.
+                raise RuntimeError(f"LLM unavailable after {generated} quizzes for {topic_id}")
+            generated += 1
+        return {"generated": generated}
+
+    def start_pregeneration(self, videos, difficulties=("medium",)):
+        for video in videos:
+            for difficulty in difficulties:
+                self.schedule_refill(video['id'], video['title'], video.get('video_id'), difficulty, 0)
+
+    @timed_stage('quiz_generate')
+    def generate_quiz(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium", fallback=True):
+        # Non-streaming generation; background refills pass fallback=False so
+        # a failed call is retried instead of banking the fallback quiz.
+        quiz_data = self._generate_from_llm(topic_id, topic_name, youtube_id, watch_time, difficulty)
+        if quiz_data or not fallback:
+            return quiz_data
+        return self._get_fallback_quiz(topic_id, topic_name, difficulty)
 
-    def generate_quiz(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium"):
-        transcript_context = self._get_transcript_text(youtube_id, watch_time)
+    def _generate_from_llm(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium"):
+        prompt = self._build_prompt(topic_id, topic_name, youtube_id, watch_time, difficulty)
+        quiz_data = self.client.generate(prompt, timeout=self.timeout)
+        generated = isinstance(quiz_data, dict) and 'questions' in quiz_data
+        record_llm_fallback('quiz_generation', int(not generated))
+        if generated:
+            self._save_to_bank(topic_id, quiz_data, difficulty, watch_time)
+            return quiz_data
+        print("Quiz generation unavailable. Using fallback quiz.")
+        return None
+
+    def _build_prompt(self, topic_id, topic_name, youtube_id, watch_time=0, difficulty="medium"):
+        transcript_context = self._get_transcript_text(youtube_id, watch_time, max_chars=3000)
         
         context_prompt = ""
         if transcript_context:
@@ -104,24 +146,13 @@ Return the result ONLY as a JSON object with this exact structure:
         }}
     ]
 }}"""
-        
+        return prompt
+
+    def _save_to_bank(self, topic_id, quiz, difficulty="medium", watch_time=0):
         try:
-            response = requests.post(self.ollama_url, json={
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json"
-            }, timeout=90) 
-            if response.status_code == 200:
-                quiz_data = json.loads(response.json().get('response', '{}'))
-                if quiz_data and 'questions' in quiz_data:
-                    return quiz_data
-        except requests.exceptions.ConnectionError:
-            print("Ollama not running. Using fallback quiz.")
+            self.bank.put(topic_id, difficulty, self.bank.bucket_for(watch_time), quiz)
         except Exception as e:
-            print(f"Ollama error: {e}")
-        
-        return self._get_fallback_quiz(topic_id, topic_name, difficulty)
+            print(f"Quiz bank error: {e}")
 
 
     def _get_fallback_quiz(self, topic_id, topic_name, difficulty):
@@ -149,7 +180,6 @@ Return the result ONLY as a JSON object with this exact structure:
                 }
             ]
         }
-        self._save_to_bank(topic_id, fallback)
         return fallback
 
 
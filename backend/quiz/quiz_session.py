@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from backend.storage.connection import sqlite_connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    handle TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    quiz TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_expires ON quiz_sessions (expires_at);
+"""
+
+
+class QuizSessionStore:
+    # Active quizzes kept server-side under a per-user handle, so the cookie
+    # carries only the handle; memory in front of SQLite, expiring after ttl.
+
+    def __init__(self, db_path='data/quiz_sessions.db', ttl=2 * 3600, memory_size=1024, purge_interval=300):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.purge_interval = purge_interval
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_purge = time.time()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def new_handle(self):
+        return uuid.uuid4().hex
+
+    def create(self, user_id, quiz):
+        handle = self.new_handle()
+        self.put(handle, user_id, quiz)
+        return handle
+
+    def put(self, handle, user_id, quiz):
+        expires_at = time.time() + self.ttl
+        self._remember(handle, str(user_id), quiz, expires_at)
+        self._conn().execute(
+            "INSERT INTO quiz_sessions (handle, user_id, quiz, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (handle) DO UPDATE SET user_id = excluded.user_id, quiz = excluded.quiz, "
+            "expires_at = excluded.expires_at",
+            (handle, str(user_id), json.dumps(quiz), expires_at)
+        )
+        self._maybe_purge()
+
+    def _remember(self, handle, user_id, quiz, expires_at):
+        with self._lock:
+            self._memory[handle] = (user_id, quiz, expires_at)
+            self._memory.move_to_end(handle)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, handle, user_id):
+        if not handle:
+            return None
+        user_id = str(user_id)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(handle)
+            if entry is not None:
+                self._memory.move_to_end(handle)
+        if entry is None:
+            row = self._conn().execute(
+                "SELECT user_id, quiz, expires_at FROM quiz_sessions WHERE handle = ?", (handle,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], json.loads(row[1]), row[2])
+            self._remember(handle, *entry)
+
+        owner, quiz, expires_at = entry
+        if owner != user_id or expires_at < now:
+            return None
+        return quiz
+
+    def discard(self, handle):
+        if not handle:
+            return
+        with self._lock:
+            self._memory.pop(handle, None)
+        self._conn().execute("DELETE FROM quiz_sessions WHERE handle = ?", (handle,))
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        self.purge(now)
+
+    def purge(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            for handle in [h for h, (_, _, expires_at) in self._memory.items() if expires_at < now]:
+                del self._memory[handle]
+        return self._conn().execute("DELETE FROM quiz_sessions WHERE expires_at < ?", (now,)).rowcount
+
+
+quiz_sessions = QuizSessionStore()
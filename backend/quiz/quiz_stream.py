@@ -0,0 +1,69 @@
+import json
+import re
+
+QUESTIONS_KEY = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuestionStreamParser:
+    # Yields each element of the streamed "questions" array as soon as it closes.
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.complete = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.obj_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        found = []
+        if self.complete:
+            return found
+        if not self.in_array:
+            match = QUESTIONS_KEY.search(self.buffer)
+            if not match:
+                return found
+            self.in_array = True
+            self.pos = match.end()
+
+        buffer = self.buffer
+        while self.pos < len(buffer):
+            ch = buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                if self.depth == 0:
+                    self.obj_start = self.pos
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0 and self.obj_start is not None:
+                    question = self._parse_question(buffer[self.obj_start:self.pos + 1])
+                    if question:
+                        found.append(question)
+                    self.obj_start = None
+            elif ch == ']' and self.depth == 0:
+                self.complete = True
+                self.pos += 1
+                break
+            self.pos += 1
+        return found
+
+    def _parse_question(self, text):
+        try:
+            question = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(question, dict) or not all(k in question for k in ('text', 'options', 'answer')):
+            return None
+        return question
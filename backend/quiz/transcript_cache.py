@@ -0,0 +1,184 @@
+import gzip
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from backend.storage.atomic import atomic_write
+
+
+def youtube_fetcher(youtube_id):
+    # Tries the call styles of the youtube_transcript_api versions we have
+    # run against; returns a list of entries or None.
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    transcript_list = None
+    try:
+        try:
+            transcript_list = YouTubeTranscriptApi.get_transcript(youtube_id)
+        except:
+            pass
+        
+        if not transcript_list:
+            try:
+                transcript_list = YouTubeTranscriptApi().get_transcript(youtube_id)
+            except:
+                pass
+        
+        if not transcript_list:
+            try:
+                ts_obj = YouTubeTranscriptApi.list(youtube_id)
+                transcript_list = ts_obj.find_transcript(['en']).fetch()
+            except:
+                try:
+                    ts_obj = YouTubeTranscriptApi().list(youtube_id)
+                    transcript_list = ts_obj.find_transcript(['en']).fetch()
+                except:
+                    pass
+        
+        if not transcript_list:
+            import youtube_transcript_api as yta
+            if hasattr(yta, 'get_transcript'):
+                transcript_list = yta.get_transcript(youtube_id)
+    except Exception as e:
+        print(f"Transcript strategies failed: {e}")
+    return transcript_list
+
+
+class LocalTranscriptFetcher:
+    # Offline stand-in: reads <directory>/<youtube_id>.json, a list of
+    # {"start": seconds, "text": "..."} entries.
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, youtube_id):
+        path = os.path.join(self.directory, f"{youtube_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+
+class Transcript:
+    # Entries joined into one string; a prefix is a binary search plus a slice.
+
+    def __init__(self, starts, texts):
+        self.starts = list(starts)
+        self.texts = list(texts)
+        self.text = " ".join(self.texts)
+        self.offsets = [0]
+        position = -1
+        for text in self.texts:
+            position += len(text) + 1
+            self.offsets.append(position)
+
+    @classmethod
+    def from_entries(cls, entries):
+        starts, texts = [], []
+        for entry in entries or []:
+            if isinstance(entry, dict):
+                start, text = entry.get('start'), entry.get('text')
+            else:
+                start, text = getattr(entry, 'start', None), getattr(entry, 'text', None)
+            if start is None or text is None:
+                continue
+            starts.append(float(start))
+            texts.append(str(text))
+        return cls(starts, texts) if starts else None
+
+    def text_until(self, watch_time, max_chars=None):
+        count = bisect_right(self.starts, watch_time)
+        if count == 0:
+            return None
+        end = self.offsets[count]
+        return self.text[:end if max_chars is None else min(end, max_chars)]
+
+    def to_dict(self):
+        return {"starts": self.starts, "texts": self.texts}
+
+
+class TranscriptCache:
+    # Gzipped transcripts on disk with an in-memory LRU; failed fetches are
+    # remembered for miss_ttl seconds.
+
+    def __init__(self, cache_dir='data/transcripts', fetcher=None, memory_size=32, miss_ttl=600):
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher or youtube_fetcher
+        self.memory_size = memory_size
+        self.miss_ttl = miss_ttl
+        self._memory = OrderedDict()
+        self._misses = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, youtube_id):
+        return os.path.join(self.cache_dir, f"{youtube_id}.json.gz")
+
+    def _remember(self, youtube_id, transcript):
+        with self._lock:
+            self._memory[youtube_id] = transcript
+            self._memory.move_to_end(youtube_id)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _load_from_disk(self, youtube_id):
+        path = self._path(youtube_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            return Transcript(data['starts'], data['texts'])
+        except Exception as e:
+            print(f"Transcript cache read error for {youtube_id}: {e}")
+            return None
+
+    def _save_to_disk(self, youtube_id, transcript):
+        path = self._path(youtube_id)
+        with atomic_write(path, 'wt', opener=gzip.open, encoding='utf-8') as f:
+            json.dump(transcript.to_dict(), f)
+
+    def get(self, youtube_id, refresh=False):
+        if not youtube_id:
+            return None
+        if not refresh:
+            with self._lock:
+                transcript = self._memory.get(youtube_id)
+                if transcript is not None:
+                    self._memory.move_to_end(youtube_id)
+                    return transcript
+                missed_at = self._misses.get(youtube_id)
+            if missed_at is not None and time.monotonic() - missed_at < self.miss_ttl:
+                return None
+            transcript = self._load_from_disk(youtube_id)
+            if transcript is not None:
+                self._remember(youtube_id, transcript)
+                return transcript
+
+        try:
+            transcript = Transcript.from_entries(self.fetcher(youtube_id))
+        except Exception as e:
+            print(f"Transcript service error: {e}")
+            transcript = None
+
+        if transcript is None:
+            with self._lock:
+                self._misses[youtube_id] = time.monotonic()
+            return None
+
+        with self._lock:
+            self._misses.pop(youtube_id, None)
+        self._save_to_disk(youtube_id, transcript)
+        self._remember(youtube_id, transcript)
+        return transcript
+
+    def text_until(self, youtube_id, watch_time, max_chars=None):
+        transcript = self.get(youtube_id)
+        return transcript.text_until(watch_time, max_chars) if transcript else None
+
+
+def default_fetcher():
+    directory = os.environ.get('EDUBOX_TRANSCRIPT_DIR')
+    return LocalTranscriptFetcher(directory) if directory else youtube_fetcher
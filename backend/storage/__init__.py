@@ -0,0 +1,5 @@
+# Backend Storage Module
+from .event_log import SegmentedEventLog, LatestIndex
+from .base import StorageBackend
+from .json_backend import JsonStorage
+from .sqlite_backend import SQLiteStorage
@@ -0,0 +1,104 @@
+import base64
+import json
+from .summary import build_summary
+
+PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+
+def normalize_email(email):
+    # The lookup key for an address; the user record keeps it as typed.
+    return (email or '').strip().lower()
+
+
+def encode_cursor(timestamp, seq):
+    raw = json.dumps([timestamp, seq]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    # Opaque to clients: the (timestamp, sequence) of the last attempt on the
+    # previous page. Anything malformed restarts from the newest attempt.
+    if not cursor:
+        return None
+    try:
+        timestamp, seq = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(timestamp or ''), int(seq)
+    except (ValueError, TypeError):
+        return None
+
+
+class StorageBackend:
+    # Keyed access to users, per-video progress and quiz attempts. Routes go
+    # through this interface instead of reading and rewriting whole files.
+
+    def get_user(self, user_id):
+        raise NotImplementedError
+
+    def get_user_by_email(self, email):
+        raise NotImplementedError
+
+    def add_user(self, user):
+        raise NotImplementedError
+
+    def update_user(self, user):
+        raise NotImplementedError
+
+    def allocate_user_id(self):
+        # Next numeric user id; never hands out the same id twice, even to
+        # concurrent registrations in different processes.
+        raise NotImplementedError
+
+    def count_users(self):
+        raise NotImplementedError
+
+    def iter_users(self):
+        raise NotImplementedError
+
+    def get_progress(self, user_id):
+        raise NotImplementedError
+
+    def get_video_progress(self, user_id, video_id):
+        return self.get_progress(user_id).get(video_id, {})
+
+    def set_video_progress(self, user_id, video_id, record):
+        raise NotImplementedError
+
+    def set_progress_many(self, user_id, records):
+        # records maps video_id to its progress record.
+        for video_id, record in records.items():
+            self.set_video_progress(user_id, video_id, record)
+
+    def iter_progress(self):
+        raise NotImplementedError
+
+    def add_attempt(self, attempt):
+        raise NotImplementedError
+
+    def get_attempts(self, user_id, topic_id=None):
+        raise NotImplementedError
+
+    def iter_attempts(self):
+        raise NotImplementedError
+
+    def get_attempts_page(self, user_id, cursor=None, limit=PAGE_LIMIT):
+        # Newest first; returns (attempts, next_cursor), next_cursor is None
+        # on the last page.
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+        keyed = sorted(
+            ((a.get('timestamp') or '', seq, a) for seq, a in enumerate(self.get_attempts(user_id))),
+            key=lambda k: (k[0], k[1]), reverse=True
+        )
+        position = decode_cursor(cursor)
+        if position is not None:
+            keyed = [k for k in keyed if (k[0], k[1]) < position]
+        page = keyed[:limit + 1]
+        next_cursor = encode_cursor(page[limit - 1][0], page[limit - 1][1]) if len(page) > limit else None
+        return [a for _, _, a in page[:limit]], next_cursor
+
+    def get_user_summary(self, user_id):
+        # Backends that maintain summaries at write time override this.
+        return build_summary(self.get_attempts(user_id))
+
+    def close(self):
+        pass
@@ -0,0 +1,10 @@
+import sqlite3
+
+
+def sqlite_connect(path, timeout=30):
+    # Autocommit connection in WAL mode; callers issue BEGIN themselves and
+    # keep one connection per thread.
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import shutil
+import threading
+from .file_lock import file_lock
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl$')
+
+
+# Append-only JSON Lines log in size-bounded segments; small closed segments
+# are merged in the background, up to compacted_max_bytes each.
+class SegmentedEventLog:
+    def __init__(self, directory, segment_max_bytes=1024 * 1024, max_segments=16, compacted_max_bytes=None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.compacted_max_bytes = compacted_max_bytes or segment_max_bytes * max_segments
+        self.lock_path = os.path.join(directory, '.lock')
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"segment-{index:06d}.jsonl")
+
+    def segment_indexes(self):
+        indexes = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                indexes.append(int(match.group(1)))
+        return sorted(indexes)
+
+    def is_empty(self):
+        return not any(os.path.getsize(self._segment_path(i)) for i in self.segment_indexes())
+
+    def append(self, record):
+        return self.append_many([record])
+
+    def append_many(self, records):
+        payload = "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records)
+        if not payload:
+            return 0
+        with self._lock:
+            with file_lock(self.lock_path, shared=True):
+                indexes = self.segment_indexes()
+                active = indexes[-1] if indexes else 1
+                with open(self._segment_path(active), 'a') as f:
+                    f.write(payload)
+                    size = f.tell()
+            if size >= self.segment_max_bytes:
+                self._rotate(active)
+        return len(records)
+
+    def _rotate(self, active):
+        with file_lock(self.lock_path):
+            indexes = self.segment_indexes()
+            if indexes and indexes[-1] == active:
+                open(self._segment_path(active + 1), 'a').close()
+        if sum(len(group) for group in self._compaction_groups()) >= self.max_segments \
+                and not self._compacting.locked():
+            threading.Thread(target=self.compact, name='event-log-compaction', daemon=True).start()
+
+    def _size(self, index):
+        try:
+            return os.path.getsize(self._segment_path(index))
+        except FileNotFoundError:
+            return None
+
+    def _compaction_groups(self):
+        # Runs of adjacent closed segments whose combined size fits in
+        # compacted_max_bytes; segments already that large are left alone.
+        groups, group, total = [], [], 0
+        for index in self.segment_indexes()[:-1]:
+            size = self._size(index)
+            if size is None:
+                continue
+            if group and total + size > self.compacted_max_bytes:
+                groups.append(group)
+                group, total = [], 0
+            if size < self.compacted_max_bytes:
+                group.append(index)
+                total += size
+            elif group:
+                groups.append(group)
+                group, total = [], 0
+        if group:
+            groups.append(group)
+        return [g for g in groups if len(g) > 1]
+
+    def compact(self):
+        with self._compacting:
+            return sum(self._merge(group) for group in self._compaction_groups())
+
+    def _merge(self, group):
+        # Closed segments are never written again, so the copy runs without
+        # blocking appends; only the swap takes the exclusive lock. Bytes are
+        # copied verbatim so global offsets (see iter_from) do not move.
+        sizes = {index: self._size(index) for index in group}
+        target = self._segment_path(group[0])
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as out:
+            for index in group:
+                with open(self._segment_path(index), 'rb') as f:
+                    shutil.copyfileobj(f, out)
+        with file_lock(self.lock_path):
+            if any(self._size(index) != size for index, size in sizes.items()):
+                # Another process compacted these segments first.
+                os.remove(tmp_path)
+                return 0
+            os.replace(tmp_path, target)
+            for index in group[1:]:
+                os.remove(self._segment_path(index))
+        return 1
+
+    def _read_segment(self, index):
+        try:
+            with open(self._segment_path(index), 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def iter_records(self):
+        for index in self.segment_indexes():
+            yield from self._read_segment(index)
+
+    def _open_from(self, offset, limit=None):
+        # (base, file) for each segment holding bytes past a global offset.
+        # Listing, sizing and opening happen under the shared lock, so a
+        # merge cannot shift the bases in between; the open handles keep
+        # reading the pre-merge files afterwards.
+        opened, base = [], 0
+        with file_lock(self.lock_path, shared=True):
+            for index in self.segment_indexes():
+                size = self._size(index)
+                if size is None:
+                    continue
+                if base + size > offset:
+                    opened.append((base, open(self._segment_path(index), 'rb')))
+                    if len(opened) == limit:
+                        break
+                base += size
+        return opened
+
+    def iter_from(self, offset=0):
+        # Yields (record, end_offset) for every complete record after a
+        # global byte offset. Offsets count bytes across all segments in
+        # order, and compaction only concatenates segments, so a saved
+        # offset stays valid after the segment it pointed into is merged.
+        opened = self._open_from(offset)
+        try:
+            for base, f in opened:
+                pos = max(0, offset - base)
+                f.seek(pos)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return
+                    pos += len(line)
+                    record = self._parse(line)
+                    if record is not None:
+                        yield record, base + pos
+        finally:
+            for _, f in opened:
+                f.close()
+
+    def end_offset(self):
+        with file_lock(self.lock_path, shared=True):
+            return sum(self._size(index) or 0 for index in self.segment_indexes())
+
+    def read_at(self, offset):
+        # The first record at or after a global offset from iter_from.
+        opened = self._open_from(offset, limit=1)
+        try:
+            if not opened:
+                return None
+            base, f = opened[0]
+            f.seek(offset - base)
+            for line in f:
+                record = self._parse(line)
+                if record is not None:
+                    return record
+            return None
+        finally:
+            for _, f in opened:
+                f.close()
+
+    def _read_segment_reversed(self, index, block_size=64 * 1024):
+        # Newest record first, reading fixed-size blocks back from the end of
+        # the file so memory stays bounded by block_size.
+        try:
+            f = open(self._segment_path(index), 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b''
+            while pos > 0:
+                step = min(block_size, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + tail).split(b"\n")
+                tail = lines.pop(0)
+                for line in reversed(lines):
+                    record = self._parse(line)
+                    if record is not None:
+                        yield record
+            record = self._parse(tail)
+            if record is not None:
+                yield record
+
+    def _parse(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def find_latest(self, predicate):
+        for index in reversed(self.segment_indexes()):
+            for record in self._read_segment_reversed(index):
+                if predicate(record):
+                    return record
+        return None
+
+    def import_json_array(self, json_path):
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                return 0
+        if not isinstance(data, list):
+            return 0
+        return self.append_many(data)
+
+
+# Offset of the newest record per key, refreshed from the end of the log.
+class LatestIndex:
+    def __init__(self, log, key):
+        self.log = log
+        self.key = key
+        self._offsets = {}
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            start = self._end
+            for record, end in self.log.iter_from(self._end):
+                self._offsets[self.key(record)] = start
+                start = end
+            self._end = start
+
+    def get(self, key):
+        for _ in range(2):
+            self.refresh()
+            offset = self._offsets.get(key)
+            if offset is None:
+                return None
+            record = self.log.read_at(offset)
+            if record is not None and self.key(record) == key:
+                return record
+            # The offset no longer lands on this key's record; rebuild once.
+            with self._lock:
+                self._offsets, self._end = {}, 0
+        return None
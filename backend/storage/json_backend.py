@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from .base import StorageBackend, normalize_email
+from .file_lock import file_lock
+from .atomic import atomic_write
+
+
+class JsonStorage(StorageBackend):
+    # Reference backend on the original whole-file JSON layout.
+
+    def __init__(self, data_dir='data'):
+        self.users_file = os.path.join(data_dir, 'users.json')
+        self.progress_file = os.path.join(data_dir, 'user_progress.json')
+        self.attempts_file = os.path.join(data_dir, 'quiz_attempts.json')
+        self._lock = threading.RLock()
+
+    def _load(self, filepath, default):
+        if not os.path.exists(filepath):
+            return default
+        with open(filepath, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return default
+
+    def _save(self, filepath, data):
+        with atomic_write(filepath) as f:
+            json.dump(data, f, indent=4)
+
+    def _read(self, filepath, default):
+        with self._lock, file_lock(filepath + '.lock', shared=True):
+            return self._load(filepath, default)
+
+    def _update(self, filepath, default, mutate):
+        with self._lock, file_lock(filepath + '.lock'):
+            data = self._load(filepath, default)
+            result = mutate(data)
+            self._save(filepath, data)
+            return result
+
+    def get_user(self, user_id):
+        return next((u for u in self._read(self.users_file, []) if u['id'] == user_id), None)
+
+    def get_user_by_email(self, email):
+        key = normalize_email(email)
+        return next((u for u in self._read(self.users_file, []) if normalize_email(u['email']) == key), None)
+
+    def add_user(self, user):
+        key = normalize_email(user['email'])
+        def mutate(users):
+            if any(normalize_email(u['email']) == key for u in users):
+                return False
+            users.append(user)
+            return True
+        return self._update(self.users_file, [], mutate)
+
+    def update_user(self, user):
+        def mutate(users):
+            for i, u in enumerate(users):
+                if u['id'] == user['id']:
+                    users[i] = user
+        self._update(self.users_file, [], mutate)
+
+    def allocate_user_id(self):
+        # Allocated under the sequence file's lock from the largest id seen
+        # or handed out, so ids are not reused even if a registration fails.
+        sequence_file = self.users_file + '.seq'
+        def mutate(state):
+            users = self._load(self.users_file, [])
+            numeric = [int(u['id']) for u in users if str(u.get('id', '')).isdigit()]
+            state['user_id'] = max([state.get('user_id', 0)] + numeric) + 1
+            return state['user_id']
+        return str(self._update(sequence_file, {}, mutate))
+
+    def count_users(self):
+        return len(self._read(self.users_file, []))
+
+    def iter_users(self):
+        return iter(self._read(self.users_file, []))
+
+    def get_progress(self, user_id):
+        return self._read(self.progress_file, {}).get(user_id, {})
+
+    def set_video_progress(self, user_id, video_id, record):
+        def mutate(progress):
+            progress.setdefault(user_id, {})[video_id] = record
+        self._update(self.progress_file, {}, mutate)
+
+    def set_progress_many(self, user_id, records):
+        def mutate(progress):
+            progress.setdefault(user_id, {}).update(records)
+        self._update(self.progress_file, {}, mutate)
+
+    def iter_progress(self):
+        for user_id, videos in self._read(self.progress_file, {}).items():
+            for video_id, record in videos.items():
+                yield user_id, video_id, record
+
+    def add_attempt(self, attempt):
+        self._update(self.attempts_file, [], lambda attempts: attempts.append(attempt))
+
+    def get_attempts(self, user_id, topic_id=None):
+        return [
+            a for a in self._read(self.attempts_file, [])
+            if a.get('user_id') == user_id and (topic_id is None or a.get('topic_id') == topic_id)
+        ]
+
+    def iter_attempts(self):
+        return iter(self._read(self.attempts_file, []))
@@ -0,0 +1,22 @@
+from .json_backend import JsonStorage
+from .sqlite_backend import SQLiteStorage
+
+
+def migrate_json_to_sqlite(data_dir='data', db_path='data/edubox.db'):
+    source = JsonStorage(data_dir)
+    target = SQLiteStorage(db_path)
+
+    users = 0
+    for user in source.iter_users():
+        if target.add_user(user):
+            users += 1
+
+    progress = 0
+    for user_id, video_id, record in source.iter_progress():
+        target.set_video_progress(user_id, video_id, record)
+        progress += 1
+
+    attempts = list(source.iter_attempts())
+    target.add_attempts(attempts)
+
+    return {"users": users, "progress": progress, "attempts": len(attempts)}
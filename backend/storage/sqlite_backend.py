@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import threading
+from .base import StorageBackend, normalize_email, PAGE_LIMIT, MAX_PAGE_LIMIT, encode_cursor, decode_cursor
+from .summary import apply_attempt, build_summary
+from .connection import sqlite_connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    user_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, video_id)
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    topic_id TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_user_seek ON attempts (user_id, COALESCE(timestamp, ''), id);
+CREATE INDEX IF NOT EXISTS idx_attempts_user_topic ON attempts (user_id, topic_id);
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_summaries (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    # Embedded SQLite in WAL mode: readers never block the single writer and
+    # every route touches only the rows it needs. Connections are per thread.
+
+    def __init__(self, db_path='data/edubox.db', timeout=30):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        conn = self._conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # v1: the email column becomes the normalized lookup key.
+            for user_id, email in conn.execute("SELECT id, email FROM users").fetchall():
+                key = normalize_email(email)
+                if key != email:
+                    try:
+                        conn.execute("UPDATE users SET email = ? WHERE id = ?", (key, user_id))
+                    except sqlite3.IntegrityError:
+                        print(f"Users {user_id} and another share the email {key} ignoring case; left unchanged")
+            conn.execute("PRAGMA user_version = 1")
+        if version < 2:
+            # v2: idx_attempts_user_time_id replaces the (user_id, timestamp) index.
+            conn.execute("DROP INDEX IF EXISTS idx_attempts_user_time")
+            conn.execute("PRAGMA user_version = 2")
+        if version < 3:
+            # v3: idx_attempts_user_seek sorts NULL timestamps as '' so keyset
+            # pages reach them; it replaces idx_attempts_user_time_id.
+            conn.execute("DROP INDEX IF EXISTS idx_attempts_user_time_id")
+            conn.execute("PRAGMA user_version = 3")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_path, self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def get_user(self, user_id):
+        row = self._conn().execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_user_by_email(self, email):
+        row = self._conn().execute("SELECT data FROM users WHERE email = ?", (normalize_email(email),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_user(self, user):
+        try:
+            self._conn().execute(
+                "INSERT INTO users (id, email, data) VALUES (?, ?, ?)",
+                (user['id'], normalize_email(user['email']), json.dumps(user))
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def add_users(self, users):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO users (id, email, data) VALUES (?, ?, ?)",
+                ((u['id'], normalize_email(u['email']), json.dumps(u)) for u in users)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update_user(self, user):
+        self._conn().execute(
+            "UPDATE users SET email = ?, data = ? WHERE id = ?",
+            (normalize_email(user['email']), json.dumps(user), user['id'])
+        )
+
+    def allocate_user_id(self):
+        # The sequence row is seeded from the largest numeric id present, then
+        # bumped under SQLite's write lock, so concurrent workers each get a
+        # distinct id.
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM sequences WHERE name = 'user_id'").fetchone()
+            if row is None:
+                start = conn.execute(
+                    "SELECT COALESCE(MAX(CAST(id AS INTEGER)), 0) FROM users WHERE id GLOB '[0-9]*'"
+                ).fetchone()[0]
+                value = start + 1
+                conn.execute("INSERT INTO sequences (name, value) VALUES ('user_id', ?)", (value,))
+            else:
+                value = row[0] + 1
+                conn.execute("UPDATE sequences SET value = ? WHERE name = 'user_id'", (value,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return str(value)
+
+    def count_users(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def iter_users(self):
+        for (data,) in self._conn().execute("SELECT data FROM users ORDER BY rowid"):
+            yield json.loads(data)
+
+    def get_progress(self, user_id):
+        rows = self._conn().execute("SELECT video_id, data FROM progress WHERE user_id = ?", (user_id,))
+        return {video_id: json.loads(data) for video_id, data in rows}
+
+    def get_video_progress(self, user_id, video_id):
+        row = self._conn().execute(
+            "SELECT data FROM progress WHERE user_id = ? AND video_id = ?", (user_id, video_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_video_progress(self, user_id, video_id, record):
+        self._conn().execute(
+            "INSERT INTO progress (user_id, video_id, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, video_id) DO UPDATE SET data = excluded.data",
+            (user_id, video_id, json.dumps(record))
+        )
+
+    def set_progress_many(self, user_id, records):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO progress (user_id, video_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, video_id) DO UPDATE SET data = excluded.data",
+                [(user_id, video_id, json.dumps(record)) for video_id, record in records.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def iter_progress(self):
+        for user_id, video_id, data in self._conn().execute("SELECT user_id, video_id, data FROM progress"):
+            yield user_id, video_id, json.loads(data)
+
+    def _stored_summary(self, conn, user_id):
+        row = conn.execute("SELECT data FROM user_summaries WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _rebuild_summary(self, conn, user_id):
+        # Users whose attempts predate the summaries table get theirs rebuilt
+        # from history once, on first touch.
+        rows = conn.execute("SELECT data FROM attempts WHERE user_id = ? ORDER BY id", (user_id,))
+        return build_summary(json.loads(data) for (data,) in rows)
+
+    def _save_summary(self, conn, user_id, summary):
+        conn.execute(
+            "INSERT INTO user_summaries (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data",
+            (user_id, json.dumps(summary))
+        )
+
+    def add_attempt(self, attempt):
+        self.add_attempts([attempt])
+
+    def add_attempts(self, attempts):
+        # Attempt rows and their owners' summaries change in one transaction.
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            summaries = {}
+            for attempt in attempts:
+                user_id = attempt.get('user_id')
+                if user_id not in summaries:
+                    summaries[user_id] = self._stored_summary(conn, user_id) or self._rebuild_summary(conn, user_id)
+                conn.execute(
+                    "INSERT INTO attempts (user_id, topic_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                    (user_id, attempt.get('topic_id'), attempt.get('timestamp'), json.dumps(attempt))
+                )
+                apply_attempt(summaries[user_id], attempt)
+            for user_id, summary in summaries.items():
+                self._save_summary(conn, user_id, summary)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_user_summary(self, user_id):
+        conn = self._conn()
+        summary = self._stored_summary(conn, user_id)
+        if summary is None:
+            summary = self._rebuild_summary(conn, user_id)
+            if summary["attempt_count"]:
+                # The rebuild ran outside a transaction; if add_attempts has
+                # stored a newer summary since, keep that one.
+                conn.execute(
+                    "INSERT INTO user_summaries (user_id, data) VALUES (?, ?) ON CONFLICT (user_id) DO NOTHING",
+                    (user_id, json.dumps(summary))
+                )
+        return summary
+
+    def get_attempts(self, user_id, topic_id=None):
+        if topic_id is None:
+            rows = self._conn().execute(
+                "SELECT data FROM attempts WHERE user_id = ? ORDER BY id", (user_id,)
+            )
+        else:
+            rows = self._conn().execute(
+                "SELECT data FROM attempts WHERE user_id = ? AND topic_id = ? ORDER BY id", (user_id, topic_id)
+            )
+        return [json.loads(data) for (data,) in rows]
+
+    def get_attempts_page(self, user_id, cursor=None, limit=PAGE_LIMIT):
+        # Keyset pagination walking idx_attempts_user_seek backwards (the id
+        # breaks timestamp ties). The row-value comparison lets SQLite seek
+        # straight to the cursor, so every page is a bounded index range scan
+        # however long the user's history is. A missing timestamp sorts as
+        # '', the same as in the JSON backend. SQLite does not seek on a row
+        # value over an expression, so the plain bound on the timestamp
+        # expression is what positions the scan.
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+        position = decode_cursor(cursor)
+        if position is None:
+            rows = self._conn().execute(
+                "SELECT id, COALESCE(timestamp, ''), data FROM attempts WHERE user_id = ? "
+                "ORDER BY COALESCE(timestamp, '') DESC, id DESC LIMIT ?", (user_id, limit + 1)
+            ).fetchall()
+        else:
+            timestamp, seq = position
+            rows = self._conn().execute(
+                "SELECT id, COALESCE(timestamp, ''), data FROM attempts WHERE user_id = ? "
+                "AND COALESCE(timestamp, '') <= ? AND (COALESCE(timestamp, ''), id) < (?, ?) "
+                "ORDER BY COALESCE(timestamp, '') DESC, id DESC LIMIT ?", (user_id, timestamp, timestamp, seq, limit + 1)
+            ).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, _, data in rows[:limit]], next_cursor
+
+    def iter_attempts(self):
+        for (data,) in self._conn().execute("SELECT data FROM attempts ORDER BY id"):
+            yield json.loads(data)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,40 @@
+import os
+from .json_backend import JsonStorage
+from .sqlite_backend import SQLiteStorage
+from .migrate import migrate_json_to_sqlite
+from .file_lock import file_lock
+from utils.metrics import timed_stage
+
+DATA_DIR = 'data'
+
+
+class TimedStorage:
+    # Records each public backend call as a "storage.<method>" stage.
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        wrapped = timed_stage(f'storage.{name}')(attr)
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+def create_storage(backend=None, data_dir=DATA_DIR, db_path=None):
+    backend = backend or os.environ.get('EDUBOX_STORAGE', 'sqlite')
+    if backend == 'json':
+        return JsonStorage(data_dir)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    db_path = db_path or os.environ.get('EDUBOX_DB_PATH', os.path.join(data_dir, 'edubox.db'))
+    with file_lock(db_path + '.lock'):
+        if not os.path.exists(db_path):
+            counts = migrate_json_to_sqlite(data_dir, db_path)
+            print(f"Initialized {db_path} from JSON files: {counts}")
+    return SQLiteStorage(db_path)
+
+storage = TimedStorage(create_storage())
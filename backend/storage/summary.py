@@ -0,0 +1,37 @@
+RECENT_POINTS = 10
+
+
+def empty_summary():
+    return {
+        "attempt_count": 0,
+        "topic_counts": {},
+        "recent": [],
+        "latest_speed": None,
+        "latest_cluster": None,
+        "last_timestamp": None
+    }
+
+
+def apply_attempt(summary, attempt):
+    # Folds one quiz attempt into a dashboard summary in O(1); attempts must
+    # arrive in timestamp order, as quiz_submit writes them.
+    topic = (attempt.get('topic_id') or 'Quiz').upper()
+    count = summary["topic_counts"].get(topic, 0) + 1
+    summary["topic_counts"][topic] = count
+    summary["attempt_count"] += 1
+    summary["recent"].append({
+        "label": f"{topic} #{count}",
+        "mastery": attempt.get('mastery', 0)
+    })
+    del summary["recent"][:-RECENT_POINTS]
+    summary["latest_speed"] = (attempt.get('adaptation') or {}).get('speed_label', 'Standard')
+    summary["latest_cluster"] = attempt.get('behavior_cluster', 'General Learner')
+    summary["last_timestamp"] = attempt.get('timestamp')
+    return summary
+
+
+def build_summary(attempts):
+    summary = empty_summary()
+    for attempt in sorted(attempts, key=lambda a: a.get('timestamp') or ''):
+        apply_attempt(summary, attempt)
+    return summary
@@ -0,0 +1,2 @@
+# Backend Video Module
+from .video_service import catalog
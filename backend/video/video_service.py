@@ -0,0 +1,94 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class CatalogService:
+    # videos.json indexed by id and category, reloaded when the file changes.
+    # Callers get copies of the shared snapshot.
+
+    def __init__(self, path='data/videos.json', check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _load(self, signature):
+        videos = []
+        raw = b''
+        if signature is not None:
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+                videos = json.loads(raw)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Catalog load error: {e}")
+                if self._snapshot is not None:
+                    return self._snapshot
+                videos = []
+
+        by_category = {}
+        for video in videos:
+            by_category.setdefault(video.get('category', 'Other'), []).append(video)
+        modified = datetime.fromtimestamp(signature[0] / 1e9, tz=timezone.utc) if signature else None
+        return {
+            "videos": videos,
+            "by_id": {video['id']: video for video in videos},
+            "by_category": by_category,
+            "version": hashlib.sha1(raw).hexdigest()[:16],
+            "last_modified": modified.replace(microsecond=0) if modified else None
+        }
+
+    def _current(self):
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            signature = self._stat()
+            self._checked_at = now
+            if self._snapshot is None or signature != self._signature:
+                self._snapshot = self._load(signature)
+                self._signature = signature
+            return self._snapshot
+
+    def videos(self, category=None):
+        snapshot = self._current()
+        videos = snapshot["by_category"].get(category, []) if category else snapshot["videos"]
+        return copy.deepcopy(videos)
+
+    def get(self, video_id):
+        video = self._current()["by_id"].get(video_id)
+        return copy.deepcopy(video) if video is not None else None
+
+    def titles(self):
+        return {video_id: video['title'] for video_id, video in self._current()["by_id"].items()}
+
+    def categories(self):
+        return list(self._current()["by_category"])
+
+    @property
+    def version(self):
+        return self._current()["version"]
+
+    @property
+    def last_modified(self):
+        return self._current()["last_modified"]
+
+
+catalog = CatalogService()
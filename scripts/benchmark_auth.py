@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.storage.sqlite_backend import SQLiteStorage
+from backend.auth.auth_service import AuthService, hash_password
+
+
+def synthetic_users(n, password_hash, batch=50_000):
+    # Every seeded account shares one precomputed hash; hashing a million
+    # passwords would measure PBKDF2, not the directory.
+    for start in range(1, n + 1, batch):
+        yield [
+            {
+                'id': str(i),
+                'name': f'User {i}',
+                'email': f'User{i}@Example.com',
+                'password': password_hash,
+                'created_at': '2024-01-01T00:00:00'
+            }
+            for i in range(start, min(start + batch, n + 1))
+        ]
+
+
+def timed(fn, samples):
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        fn(sample)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def report(name, latencies_ms):
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    print(f"{name:<28} n={len(latencies_ms):<6} p50 {p50:8.3f}ms  p95 {p95:8.3f}ms  p99 {p99:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the user directory at a large number of registered users.")
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=10_000)
+    parser.add_argument('--logins', type=int, default=50, help="Full logins and registrations (each runs PBKDF2)")
+    parser.add_argument('--scan-samples', type=int, default=20, help="Lookups for the old linear-scan baseline")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteStorage(os.path.join(tmp_dir, 'users.db'))
+        auth = AuthService(store)
+        password_hash = hash_password('secret', auth.iterations)
+
+        start = time.perf_counter()
+        for batch in synthetic_users(args.users, password_hash):
+            store.add_users(batch)
+        print(f"Seeded {store.count_users():,} users in {time.perf_counter() - start:.1f}s")
+
+        existing = [f"user{rng.randint(1, args.users)}@EXAMPLE.com " for _ in range(args.lookups)]
+        missing = [f"nobody{i}@example.com" for i in range(args.lookups)]
+        report("email lookup (hit)", timed(store.get_user_by_email, existing))
+        report("email lookup (miss)", timed(store.get_user_by_email, missing))
+        report("id allocation", timed(lambda _: store.allocate_user_id(), range(args.lookups)))
+
+        logins = existing[:args.logins]
+        report("login (correct password)", timed(lambda email: auth.authenticate(email, 'secret'), logins))
+        report("login (wrong password)", timed(lambda email: auth.authenticate(email, 'wrong'), logins))
+        report("login (unknown email)", timed(lambda email: auth.authenticate(email, 'secret'), missing[:args.logins]))
+        report("register", timed(lambda i: auth.register('New', f'new{i}@example.com', 'secret'),
+                                 range(args.logins)))
+
+        # The previous implementation: load every user and scan for the email.
+        users = [u for batch in synthetic_users(args.users, password_hash) for u in batch]
+        targets = [f"User{rng.randint(1, args.users)}@Example.com" for _ in range(args.scan_samples)]
+        report("linear scan (old login)", timed(
+            lambda email: next((u for u in users if u['email'] == email), None), targets))
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
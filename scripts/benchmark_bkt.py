@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.bkt.bkt_engine import BKTEngine
+
+
+def synthetic_observations(n, num_users, num_concepts, seed=42):
+    rng = np.random.default_rng(seed)
+    users = rng.integers(1, num_users + 1, size=n).astype(str)
+    concepts = np.char.add('topic-', rng.integers(0, num_concepts, size=n).astype(str))
+    correct = rng.random(n) < 0.6
+    return list(zip(users.tolist(), concepts.tolist(), correct.tolist()))
+
+
+def make_engine(tmp_dir, name, precision):
+    path = os.path.join(tmp_dir, f'{name}.json')
+    return BKTEngine(storage_path=path, flush_interval=0, flush_size=float('inf'), precision=precision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scalar BKT updates with the vectorized batch path.")
+    parser.add_argument('--observations', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--concepts', type=int, default=20)
+    parser.add_argument('--precision', type=int, default=4, help="Rounding applied to stored mastery; -1 disables it")
+    args = parser.parse_args()
+    precision = None if args.precision < 0 else args.precision
+
+    observations = synthetic_observations(args.observations, args.users, args.concepts)
+    print(f"{len(observations)} observations, {args.users} users, {args.concepts} concepts, precision={precision}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scalar = make_engine(tmp_dir, 'scalar', precision)
+        start = time.perf_counter()
+        for user_id, concept_id, correct in observations:
+            scalar.update_mastery(user_id, concept_id, correct)
+        scalar_time = time.perf_counter() - start
+
+        batch = make_engine(tmp_dir, 'batch', precision)
+        start = time.perf_counter()
+        result = batch.update_mastery_batch(observations, persist=False)
+        batch_time = time.perf_counter() - start
+
+        mismatches = sum(
+            1 for (user_id, concept_id), p in result.items()
+            if scalar.get_mastery(user_id, concept_id) != p
+        )
+        scalar.store.close()
+        batch.store.close()
+
+    print(f"scalar loop : {scalar_time:8.3f}s  {len(observations) / scalar_time:12,.0f} obs/s")
+    print(f"batch replay: {batch_time:8.3f}s  {len(observations) / batch_time:12,.0f} obs/s")
+    print(f"speedup     : {scalar_time / batch_time:8.1f}x")
+    print(f"pairs compared: {len(result)}, mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
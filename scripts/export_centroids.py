@@ -0,0 +1,28 @@
+import os
+import pickle
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.models.centroid_model import CentroidModel, FEATURES
+
+MODELS_DIR = os.path.join(PROJECT_ROOT, 'models')
+CLUSTERING_MODEL_PATH = os.path.join(MODELS_DIR, 'clustering_model.pkl')
+CENTROIDS_PATH = os.path.join(MODELS_DIR, 'clustering_centroids.json')
+
+
+def main():
+    if not os.path.exists(CLUSTERING_MODEL_PATH):
+        print(f"No clustering model at {CLUSTERING_MODEL_PATH}. Run scripts/train_models.py first.")
+        return 1
+    with open(CLUSTERING_MODEL_PATH, 'rb') as f:
+        kmeans = pickle.load(f)
+
+    features = list(getattr(kmeans, 'feature_names_in_', FEATURES))
+    CentroidModel.from_estimator(kmeans, features).save(CENTROIDS_PATH)
+    print(f"Exported {len(kmeans.cluster_centers_)} centroids to {CENTROIDS_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
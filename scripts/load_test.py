@@ -0,0 +1,324 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import requests
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.fake_ollama import FakeOllamaServer
+
+PASSWORD = 'loadtest-password'
+QUIZ_QUESTIONS = re.compile(r'const quizQuestions = (.*);')
+
+
+def prepare_workspace(tmp_dir):
+    # The app resolves data/ and models/ against the working directory, so the
+    # run gets its own copy of the JSON seed data and never touches the repo's.
+    os.makedirs(os.path.join(tmp_dir, 'data'))
+    for name in os.listdir(os.path.join(PROJECT_ROOT, 'data')):
+        if name.endswith('.json'):
+            shutil.copy(os.path.join(PROJECT_ROOT, 'data', name), os.path.join(tmp_dir, 'data', name))
+    models_dir = os.path.join(PROJECT_ROOT, 'models')
+    if os.path.isdir(models_dir):
+        shutil.copytree(models_dir, os.path.join(tmp_dir, 'models'),
+                        ignore=shutil.ignore_patterns('clustering_checkpoint.json'))
+    os.chdir(tmp_dir)
+
+
+def seed_users(storage, auth_service, n, batch=5_000):
+    # One shared hash: the run should measure logins, not seeding.
+    from backend.auth.auth_service import hash_password
+    password_hash = hash_password(PASSWORD, auth_service.iterations)
+    emails = []
+    for start in range(0, n, batch):
+        users = []
+        for i in range(start, min(start + batch, n)):
+            email = f'loadtest{i}@example.com'
+            users.append({
+                'id': storage.allocate_user_id(),
+                'name': f'Load Test {i}',
+                'email': email,
+                'password': password_hash,
+                'created_at': datetime.now().isoformat()
+            })
+            emails.append(email)
+        if hasattr(storage, 'add_users'):
+            storage.add_users(users)
+        else:
+            for user in users:
+                storage.add_user(user)
+    return emails
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.tracking = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def count_tracking(self, counts):
+        with self._lock:
+            for key in ('accepted', 'videos', 'logged'):
+                self.tracking[key] += counts.get(key, 0)
+
+    def call(self, name, send):
+        start = time.perf_counter()
+        try:
+            response = send()
+            ok = response.status_code < 400
+        except requests.RequestException as e:
+            print(f"{name} failed: {e}")
+            response, ok = None, False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+        return response if ok else None
+
+    def summary(self, duration):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = np.array(samples) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            endpoints[name] = {
+                'count': len(samples),
+                'errors': self.errors[name],
+                'throughput_rps': round(len(samples) / duration, 2),
+                'mean_ms': round(float(latencies.mean()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(float(latencies.max()), 3)
+            }
+        return endpoints
+
+
+def tracking_flushes(topic, flushes, rng, snapshots_per_flush=3):
+    # Cumulative snapshots shaped like video.html's trackingData, grouped
+    # the way its periodic flush sends them.
+    duration = 600.0
+    state = {'pause_count': 0, 'rewatch_count': 0, 'skip_ratio': 0, 'watch_percentage': 0,
+             'last_time': 0, 'total_duration': duration, 'max_reached': 0}
+    steps = flushes * snapshots_per_flush
+    for flush in range(flushes):
+        events = []
+        for step in range(flush * snapshots_per_flush, (flush + 1) * snapshots_per_flush):
+            state['pause_count'] += rng.random() < 0.3
+            state['rewatch_count'] += rng.random() < 0.1
+            state['last_time'] = round(duration * (step + 1) / steps, 1)
+            state['max_reached'] = max(state['max_reached'], state['last_time'])
+            state['watch_percentage'] = round(100 * state['max_reached'] / duration)
+            events.append({'topic_id': topic['id'], **state})
+        yield events
+
+
+def read_stream(response):
+    # Drains the quiz SSE stream and returns the questions it carried.
+    questions, event = [], None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event: '):
+            event = line[7:]
+        elif line.startswith('data: ') and event == 'question':
+            questions.append(json.loads(line[6:]))
+    return questions
+
+
+def journey(base_url, email, topics, recorder, args, rng):
+    # One learner: log in, open the dashboard, watch part of a video, take
+    # its quiz and submit answers.
+    http = requests.Session()
+    if recorder.call('/login', lambda: http.post(f'{base_url}/login',
+                                                 json={'email': email, 'password': PASSWORD})) is None:
+        return
+    recorder.call('/dashboard', lambda: http.get(f'{base_url}/dashboard'))
+
+    topic = rng.choice(topics)
+    for events in tracking_flushes(topic, args.track_events, rng):
+        response = recorder.call('/api/video-track/batch', lambda: http.post(
+            f'{base_url}/api/video-track/batch', json={'events': events}))
+        if response is not None:
+            recorder.count_tracking(response.json())
+
+    page = recorder.call('/quiz/<topic_id>', lambda: http.get(f"{base_url}/quiz/{topic['id']}"))
+    if page is None:
+        return
+    match = QUIZ_QUESTIONS.search(page.text)
+    questions = json.loads(match.group(1)) if match else []
+    if not questions:
+        stream_url = f"{base_url}/quiz/{topic['id']}/stream"
+        streamed = []
+
+        def fetch_stream():
+            response = http.get(stream_url, stream=True)
+            streamed.extend(read_stream(response))
+            return response
+        recorder.call('/quiz/<topic_id>/stream', fetch_stream)
+        questions = streamed
+    if not questions:
+        return
+
+    responses = []
+    for question in questions:
+        options = question.get('options') or [question.get('answer')]
+        correct = rng.random() < args.accuracy
+        responses.append({
+            'question_id': question['id'],
+            'selected_answer': question.get('answer') if correct else rng.choice(options),
+            'time_taken': round(rng.uniform(3, 30), 1)
+        })
+    recorder.call('/api/quiz-submit', lambda: http.post(f'{base_url}/api/quiz-submit', json={
+        'topic_id': topic['id'], 'responses': responses, 'difficulty': 'medium'
+    }))
+
+
+def scrape_llm_counters(base_url):
+    counters = {}
+    try:
+        text = requests.get(f'{base_url}/metrics', timeout=10).text
+    except requests.RequestException:
+        return counters
+    for line in text.splitlines():
+        if line.startswith(('edubox_llm_attempts_total', 'edubox_llm_fallbacks_total', 'edubox_llm_requests_total')):
+            name, value = line.rsplit(' ', 1)
+            counters[name] = float(value)
+    return counters
+
+
+def report(endpoints, duration):
+    total = sum(e['count'] for e in endpoints.values())
+    print(f"{'endpoint':<26} {'n':>6} {'err':>5} {'req/s':>8} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, e in endpoints.items():
+        print(f"{name:<26} {e['count']:>6} {e['errors']:>5} {e['throughput_rps']:>8.1f} "
+              f"{e['p50_ms']:>8.2f}ms {e['p95_ms']:>8.2f}ms {e['p99_ms']:>8.2f}ms")
+    print(f"{total} requests in {duration:.1f}s ({total / duration:.1f} req/s)")
+
+
+def compare(endpoints, baseline_path, tolerance):
+    # Flags endpoints whose p95 grew by more than tolerance over the baseline.
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (p95, tolerance {tolerance:.0%})")
+    for name, e in endpoints.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<26} new endpoint")
+            continue
+        change = (e['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        flag = 'REGRESSION' if change > tolerance else ''
+        regressions += bool(flag)
+        print(f"{name:<26} {before['p95_ms']:>8.2f}ms -> {e['p95_ms']:>8.2f}ms  {change:+7.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the app's main endpoints concurrently against a fake Ollama.")
+    parser.add_argument('--users', type=int, default=1000, help="Synthetic accounts to seed")
+    parser.add_argument('--journeys', type=int, default=200, help="Learner journeys to run")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--track-events', type=int, default=5, help="Tracking batch flushes per journey")
+    parser.add_argument('--accuracy', type=float, default=0.7, help="Chance a simulated answer is correct")
+    parser.add_argument('--storage', choices=['sqlite', 'json'], default='sqlite')
+    parser.add_argument('--grading-mode', choices=['local', 'llm'], default=None)
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="Seconds before each fake Ollama response")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of LLM calls answered with HTTP 500")
+    parser.add_argument('--pregenerate', action='store_true', help="Fill the quiz bank before the run starts")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare p95 latencies against")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    cwd = os.getcwd()
+
+    fake = FakeOllamaServer(latency=args.llm_latency, token_latency=args.token_latency,
+                            failure_rate=args.failure_rate, seed=args.seed).start()
+    tmp_dir = tempfile.mkdtemp(prefix='edubox-load-')
+    try:
+        prepare_workspace(tmp_dir)
+        os.environ.update({
+            'OLLAMA_URL': fake.url,
+            'EDUBOX_STORAGE': args.storage,
+            'EDUBOX_PREGENERATE': '1' if args.pregenerate else '0'
+        })
+        os.environ.pop('EDUBOX_DB_PATH', None)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        import app as edubox
+        from werkzeug.serving import make_server
+        if args.grading_mode:
+            edubox.evaluator.grading_mode = args.grading_mode
+
+        start = time.perf_counter()
+        emails = seed_users(edubox.storage, edubox.auth_service, args.users)
+        print(f"Seeded {len(emails)} users in {time.perf_counter() - start:.1f}s ({args.storage})")
+
+        if args.pregenerate:
+            # Wait for the refill jobs queued at import to finish.
+            while any(edubox.job_queue.stats().get(s) for s in ('queued', 'running')):
+                time.sleep(0.5)
+
+        server = make_server('127.0.0.1', 0, edubox.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        topics = edubox.catalog.videos()
+        recorder = Recorder()
+        rngs = [random.Random(args.seed + i) for i in range(args.journeys)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for i in range(args.journeys):
+                pool.submit(journey, base_url, emails[i % len(emails)], topics, recorder, args, rngs[i])
+        duration = time.perf_counter() - start
+
+        endpoints = recorder.summary(duration)
+        results = {
+            'created_at': datetime.now().isoformat(),
+            'config': vars(args),
+            'duration_s': round(duration, 3),
+            'total_requests': sum(e['count'] for e in endpoints.values()),
+            'throughput_rps': round(sum(e['count'] for e in endpoints.values()) / duration, 2),
+            'endpoints': endpoints,
+            'tracking': dict(recorder.tracking),
+            'fake_ollama_requests': fake.requests,
+            'llm_counters': scrape_llm_counters(base_url)
+        }
+        server.shutdown()
+        edubox.job_queue.stop()
+    finally:
+        os.chdir(cwd)
+        fake.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report(endpoints, duration)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    if recorder.tracking['logged'] == 0:
+        # Every batch was dropped before reaching the micro-pattern log, so
+        # the tracking write path was never measured.
+        print(f"Error: tracking logged no interactions ({dict(recorder.tracking)})")
+        return 1
+    if baseline:
+        return 1 if compare(endpoints, baseline, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.storage.migrate import migrate_json_to_sqlite
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy users, progress and quiz attempts from the JSON files into SQLite.")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--db', default=os.path.join(DATA_DIR, 'edubox.db'))
+    parser.add_argument('--force', action='store_true', help="Replace an existing database file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            print(f"{args.db} already exists. Use --force to rebuild it from the JSON files.")
+            return 1
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    counts = migrate_json_to_sqlite(args.data_dir, args.db)
+    print(f"Migrated {counts['users']} users, {counts['progress']} progress records and {counts['attempts']} quiz attempts into {args.db}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
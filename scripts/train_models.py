@@ -1,91 +1,264 @@
-import json
+import argparse
 import os
-import pickle
-import pandas as pd
-import numpy as np
-from sklearn.cluster import KMeans
-from pyBKT.models import Model
+import resource
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
+import numpy as np
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.storage.event_log import SegmentedEventLog
+from backend.storage.sqlite_backend import SQLiteStorage
+from backend.models.registry import save_pickle_atomic
+from backend.models.centroid_model import CentroidModel, match_labels, CLUSTER_LABELS, FEATURES
+from backend.models.bkt_training import train_skills_parallel
+from utils.json_stream import iter_json_array
 
 
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 MODELS_DIR = os.path.join(PROJECT_ROOT, 'models')
 
 MICRO_PATTERNS_FILE = os.path.join(DATA_DIR, 'micro_patterns.json')
+MICRO_PATTERNS_DIR = os.path.join(DATA_DIR, 'micro_patterns')
 QUIZ_ATTEMPTS_FILE = os.path.join(DATA_DIR, 'quiz_attempts.json')
+STORAGE_DB_PATH = os.path.join(DATA_DIR, 'edubox.db')
 CLUSTERING_MODEL_PATH = os.path.join(MODELS_DIR, 'clustering_model.pkl')
+CENTROIDS_PATH = os.path.join(MODELS_DIR, 'clustering_centroids.json')
 BKT_MODEL_PATH = os.path.join(MODELS_DIR, 'bkt_model.pkl')
 
+CHUNK_SIZE = 65536
+# Rough working-set multipliers over the raw typed columns: KMeans keeps
+# distance and label buffers next to X; pyBKT expands each response into
+# per-sequence arrays and a DataFrame with string columns.
+CLUSTERING_OVERHEAD = 4
+BKT_OVERHEAD = 24
+
 def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def load_json(filepath):
-    if not os.path.exists(filepath):
-        print(f"Warning: File not found at {filepath}")
-        return []
-    with open(filepath, 'r') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode JSON from {filepath}")
-            return []
-
-def train_clustering():
+def parse_size(text):
+    # "512M", "2G", "800K" or a plain number of megabytes.
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text) * units['M'])
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError):
+        return float('nan')
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+@contextmanager
+def stage(name, report):
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = {
+            "stage": name,
+            "seconds": time.perf_counter() - start,
+            "rss_mb": rss_mb(),
+            "rss_delta_mb": rss_mb() - start_rss,
+            "peak_rss_mb": peak_rss_mb()
+        }
+        report.append(entry)
+        print(f"  [{name}] {entry['seconds']:.2f}s, rss {entry['rss_mb']:.0f}MB "
+              f"({entry['rss_delta_mb']:+.0f}MB), peak {entry['peak_rss_mb']:.0f}MB")
+
+def iter_micro_patterns():
+    if os.path.isdir(MICRO_PATTERNS_DIR):
+        log = SegmentedEventLog(MICRO_PATTERNS_DIR)
+        if not log.is_empty():
+            return (record for record, _ in log.iter_from(0))
+    if not os.path.exists(MICRO_PATTERNS_FILE):
+        print(f"Warning: File not found at {MICRO_PATTERNS_FILE}")
+        return iter(())
+    return iter_json_array(MICRO_PATTERNS_FILE)
+
+def iter_quiz_attempts():
+    # Attempts live in SQLite once the app has migrated them; the JSON file
+    # is only read for installs that still run on the JSON backend.
+    if os.path.exists(STORAGE_DB_PATH):
+        return SQLiteStorage(STORAGE_DB_PATH).iter_attempts()
+    if not os.path.exists(QUIZ_ATTEMPTS_FILE):
+        print(f"Warning: File not found at {QUIZ_ATTEMPTS_FILE}")
+        return iter(())
+    return iter_json_array(QUIZ_ATTEMPTS_FILE)
+
+def feature_chunks(records, chunk_size):
+    # Fixed-size float32 blocks of the clustering features.
+    block = np.empty((chunk_size, len(FEATURES)), dtype=np.float32)
+    n = 0
+    for record in records:
+        for j, feature in enumerate(FEATURES):
+            block[n, j] = record.get(feature, 0) or 0
+        n += 1
+        if n == chunk_size:
+            yield block
+            block = np.empty((chunk_size, len(FEATURES)), dtype=np.float32)
+            n = 0
+    if n:
+        yield block[:n]
+
+def response_chunks(records, chunk_size, users, skills):
+    # Fixed-size typed columns for BKT: int32 user and skill codes (indexes
+    # into the growing users/skills lists) and int8 correctness.
+    user_codes, skill_codes = {}, {}
+    def code(table, names, value):
+        index = table.get(value)
+        if index is None:
+            index = table[value] = len(names)
+            names.append(value)
+        return index
+
+    block = (np.empty(chunk_size, np.int32), np.empty(chunk_size, np.int32), np.empty(chunk_size, np.int8))
+    n = 0
+    for attempt in records:
+        block[0][n] = code(user_codes, users, str(attempt.get('user_id')))
+        block[1][n] = code(skill_codes, skills, str(attempt.get('topic_id')))
+        block[2][n] = 1 if (attempt.get('score', 0) or 0) >= 70 else 0
+        n += 1
+        if n == chunk_size:
+            yield block
+            block = (np.empty(chunk_size, np.int32), np.empty(chunk_size, np.int32), np.empty(chunk_size, np.int8))
+            n = 0
+    if n:
+        yield tuple(column[:n] for column in block)
+
+def train_clustering(max_memory, chunk_size, report):
     print("--- Training Micro-Pattern Clustering Model ---")
-    data = load_json(MICRO_PATTERNS_FILE)
-    if len(data) < 5:
-        print(f"Insufficient data for clustering (found {len(data)}, need at least 5). Skipping.")
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    # Past max_rows the matrix is never materialized: chunks go straight
+    # into MiniBatchKMeans.partial_fit instead of a full KMeans fit.
+    max_rows = max(chunk_size, max_memory // (len(FEATURES) * 4 * CLUSTERING_OVERHEAD))
+    chunks = []
+    total = 0
+    streaming = None
+    with stage("clustering: parse", report):
+        for block in feature_chunks(iter_micro_patterns(), chunk_size):
+            total += len(block)
+            if streaming is None and total > max_rows:
+                print(f"{total} records exceed the memory budget; switching to MiniBatchKMeans.")
+                streaming = MiniBatchKMeans(n_clusters=3, random_state=42, batch_size=chunk_size, n_init=3)
+                for pending in chunks:
+                    streaming.partial_fit(pending)
+                chunks = []
+            if streaming is not None:
+                streaming.partial_fit(block)
+            else:
+                chunks.append(block)
+
+    if total < 5:
+        print(f"Insufficient data for clustering (found {total}, need at least 5). Skipping.")
         return
 
-    df = pd.DataFrame(data)
-    features = ['pause_count', 'rewatch_count', 'skip_ratio', 'watch_percentage']
-    X = df[features]
-    
-    print(f"Fitting KMeans on {len(data)} interaction records...")
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
-    kmeans.fit(X)
-    
-    ensure_dir(MODELS_DIR)
-    with open(CLUSTERING_MODEL_PATH, 'wb') as f:
-        pickle.dump(kmeans, f)
+    with stage("clustering: fit", report):
+        if streaming is not None:
+            estimator = streaming
+        else:
+            X = np.concatenate(chunks)
+            chunks = None
+            print(f"Fitting KMeans on {total} interaction records...")
+            estimator = KMeans(n_clusters=3, random_state=42, n_init=10)
+            estimator.fit(X)
+
+    with stage("clustering: save", report):
+        model = CentroidModel.from_estimator(estimator, FEATURES)
+        previous = CentroidModel.load(CENTROIDS_PATH) if os.path.exists(CENTROIDS_PATH) else None
+        model.labels = match_labels(model, previous, CLUSTER_LABELS)
+        print(f"Cluster labels: {model.labels}")
+
+        ensure_dir(MODELS_DIR)
+        save_pickle_atomic(estimator, CLUSTERING_MODEL_PATH)
+        model.save(CENTROIDS_PATH)
     print(f"Successfully saved clustering model to {CLUSTERING_MODEL_PATH}")
+    print(f"Exported inference centroids to {CENTROIDS_PATH}")
 
-def train_bkt():
+def train_bkt(max_memory, chunk_size, report, workers=None, restarts=1):
     print("\n--- Training BKT Model ---")
-    data = load_json(QUIZ_ATTEMPTS_FILE)
-    if not data:
+
+    # Keeps the newest responses that fit the budget; older chunks are
+    # dropped whole as new ones arrive.
+    max_rows = max(chunk_size, max_memory // (9 * BKT_OVERHEAD))
+    users, skills = [], []
+    kept = deque()
+    kept_rows = dropped = 0
+    with stage("bkt: parse", report):
+        for block in response_chunks(iter_quiz_attempts(), chunk_size, users, skills):
+            kept.append(block)
+            kept_rows += len(block[0])
+            while kept_rows - len(kept[0][0]) >= max_rows:
+                oldest = kept.popleft()
+                kept_rows -= len(oldest[0])
+                dropped += len(oldest[0])
+
+    if not kept_rows:
         print("No quiz attempts found. Skipping BKT training.")
         return
+    if dropped:
+        print(f"Memory budget allows {max_rows} responses; trained on the newest {kept_rows}, skipped {dropped}.")
+
+    with stage("bkt: fit", report):
+        user_col, skill_col, correct_col = (np.concatenate(column) for column in zip(*kept))
+        kept.clear()
+        print(f"Fitting pyBKT on {kept_rows} response points across {len(skills)} skills "
+              f"({restarts} restart(s) each, {workers or os.cpu_count()} workers)...")
+        model, summary = train_skills_parallel(users, skills, user_col, skill_col, correct_col,
+                                               workers=workers, restarts=restarts, seed=42)
+        for skill, result in summary.items():
+            print(f"  {skill}: {result['rows']} responses, best seed {result['seed']}, "
+                  f"log-likelihood {result['log_likelihood']:.2f}")
+        if model is None:
+            print("No skill could be fitted. Keeping the existing BKT model.")
+            return
 
-    bkt_data = []
-    for attempt in data:
-        user_id = attempt.get('user_id')
-        concept = attempt.get('topic_id')
-        correct = 1 if attempt.get('score', 0) >= 70 else 0
-        
-        bkt_data.append({
-            'user_id': user_id,
-            'skill_name': concept,
-            'correct': correct
-        })
-    
-    df = pd.DataFrame(bkt_data)
-    
-    print(f"Fitting pyBKT on {len(df)} response points...")
-    model = Model(seed=42, num_fits=1)
-    model.fit(data=df)
-    
-    ensure_dir(MODELS_DIR)
-    with open(BKT_MODEL_PATH, 'wb') as f:
-        pickle.dump(model, f)
+    with stage("bkt: save", report):
+        ensure_dir(MODELS_DIR)
+        save_pickle_atomic(model, BKT_MODEL_PATH)
     print(f"Successfully saved BKT model to {BKT_MODEL_PATH}")
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Train the clustering and BKT models from the interaction history.")
+    parser.add_argument('--max-memory', default='1G',
+                        help="Approximate working-set budget per stage, e.g. 512M or 2G (default: 1G)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Records per typed chunk")
+    parser.add_argument('--skip-clustering', action='store_true')
+    parser.add_argument('--skip-bkt', action='store_true')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for per-skill BKT training (default: one per CPU)")
+    parser.add_argument('--restarts', type=int, default=1,
+                        help="Random restarts per skill; the best log-likelihood is kept")
+    args = parser.parse_args()
+    max_memory = parse_size(args.max_memory)
+
     print(f"Model Training Session - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Project Root: {PROJECT_ROOT}")
-    train_clustering()
-    train_bkt()
+    print(f"Memory budget: {max_memory / (1 << 20):.0f}MB, chunk size: {args.chunk_size}")
+
+    report = []
+    if not args.skip_clustering:
+        train_clustering(max_memory, args.chunk_size, report)
+    if not args.skip_bkt:
+        train_bkt(max_memory, args.chunk_size, report, workers=args.workers, restarts=max(1, args.restarts))
+
+    print("\nStage summary:")
+    for entry in report:
+        print(f"  {entry['stage']:<20} {entry['seconds']:8.2f}s  peak {entry['peak_rss_mb']:6.0f}MB")
     print("\nAll training tasks completed successfully.")
+
+if __name__ == "__main__":
+    main()
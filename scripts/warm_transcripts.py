@@ -0,0 +1,40 @@
+import argparse
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.quiz.transcript_cache import TranscriptCache, LocalTranscriptFetcher, youtube_fetcher
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+VIDEOS_FILE = os.path.join(DATA_DIR, 'videos.json')
+TRANSCRIPTS_DIR = os.path.join(DATA_DIR, 'transcripts')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch and cache the transcript of every video in data/videos.json.")
+    parser.add_argument('--source-dir', help="Read <youtube_id>.json transcripts from this directory instead of YouTube")
+    parser.add_argument('--refresh', action='store_true', help="Refetch transcripts that are already cached")
+    args = parser.parse_args()
+
+    fetcher = LocalTranscriptFetcher(args.source_dir) if args.source_dir else youtube_fetcher
+    cache = TranscriptCache(cache_dir=TRANSCRIPTS_DIR, fetcher=fetcher)
+
+    with open(VIDEOS_FILE, 'r') as f:
+        videos = json.load(f)
+
+    missing = 0
+    for video in videos:
+        transcript = cache.get(video.get('video_id'), refresh=args.refresh)
+        if transcript:
+            print(f"{video['id']:>8}  {video.get('video_id')}  {len(transcript.starts)} entries, {len(transcript.text)} chars")
+        else:
+            missing += 1
+            print(f"{video['id']:>8}  {video.get('video_id')}  transcript unavailable")
+    print(f"Cached {len(videos) - missing} of {len(videos)} transcripts in {TRANSCRIPTS_DIR}")
+    return 1 if missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
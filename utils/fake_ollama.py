@@ -0,0 +1,171 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _quiz_response(prompt):
+    topic = re.search(r'"topic_id": "([^"]*)"', prompt)
+    difficulty = re.search(r'"difficulty": "([^"]*)"', prompt)
+    topic_id = topic.group(1) if topic else "topic"
+    questions = []
+    for i in range(1, 4):
+        options = [f"{topic_id} option {i}{letter}" for letter in "ABCD"]
+        questions.append({
+            "id": i,
+            "text": f"Synthetic question {i} about {topic_id}?",
+            "options": options,
+            "answer": options[0]
+        })
+    return {
+        "topic_id": topic_id,
+        "difficulty": difficulty.group(1) if difficulty else "medium",
+        "questions": questions
+    }
+
+
+def _grading_response(prompt):
+    selected = re.search(r"Student's Answer: (.*)", prompt)
+    correct = re.search(r"Correct Answer: (.*)", prompt)
+    is_correct = bool(selected and correct and selected.group(1).strip().lower() == correct.group(1).strip().lower())
+    return {
+        "is_correct": is_correct,
+        "feedback": "Nicely reasoned." if is_correct else "That option misses the key idea."
+    }
+
+
+def fake_completion(prompt):
+    if "MCQ quiz" in prompt:
+        return _quiz_response(prompt)
+    if "Student's Answer" in prompt:
+        return _grading_response(prompt)
+    return {"response": "ok"}
+
+
+class FakeOllamaServer:
+    # Stand-in for the Ollama HTTP API with configurable latency and failures.
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, token_latency=0.0, chunk_size=16,
+                 failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.failure_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json(200, {"models": [{"name": "llama3"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": "invalid json"})
+                    return
+                if self.path != '/api/generate':
+                    self._send_json(404, {"error": "not found"})
+                    return
+
+                time.sleep(server.latency)
+                if server._should_fail():
+                    self._send_json(500, {"error": "injected failure"})
+                    return
+
+                text = json.dumps(fake_completion(body.get('prompt', '')))
+                model = body.get('model', 'llama3')
+                if not body.get('stream', True):
+                    self._send_json(200, {"model": model, "response": text, "done": True})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for i in range(0, len(text), server.chunk_size):
+                    self._write_chunk({"model": model, "response": text[i:i + server.chunk_size], "done": False})
+                    time.sleep(server.token_latency)
+                self._write_chunk({"model": model, "response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, obj):
+                line = (json.dumps(obj) + "\n").encode()
+                self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for local testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, latency=args.latency, token_latency=args.token_latency,
+                              failure_rate=args.failure_rate)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
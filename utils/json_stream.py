@@ -0,0 +1,61 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_FOLLOW = _WHITESPACE + ',]'
+
+
+def iter_json_array(path, buffer_size=1 << 20):
+    # Yields the elements of a top-level JSON array one at a time, reading
+    # the file in buffer_size pieces, so memory follows the largest element
+    # rather than the whole file.
+    with open(path, 'r') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        expect_value = True
+        started = first = False
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unterminated JSON array")
+                chunk = f.read(buffer_size)
+                eof = not chunk
+                buffer, pos = chunk, 0
+                continue
+
+            ch = buffer[pos]
+            if not started:
+                if ch != '[':
+                    raise ValueError(f"{path} does not contain a JSON array")
+                started = first = True
+                pos += 1
+            elif ch == ']' and (first or not expect_value):
+                return
+            elif not expect_value:
+                if ch != ',':
+                    raise ValueError(f"{path}: expected ',' between array elements")
+                pos += 1
+                expect_value = True
+            else:
+                try:
+                    item, end = _decoder.raw_decode(buffer, pos)
+                    # A number cut by the end of the buffer still decodes
+                    # ("2." from "2.5"), so the value only counts once the
+                    # character after it is one that may follow an element.
+                    complete = eof or (end < len(buffer) and buffer[end] in _FOLLOW)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    complete = False
+                if not complete:
+                    chunk = f.read(buffer_size)
+                    eof = not chunk
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+                yield item
+                pos = end
+                expect_value = first = False
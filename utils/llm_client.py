@@ -1,52 +1,186 @@
-import requests
+import asyncio
 import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils.metrics import metrics
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures; after reset_timeout
+    # a single trial call decides whether it closes again.
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        # The caller gave up before the call finished (a streaming client
+        # disconnected): no verdict either way, but free the half-open trial.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Ollama circuit opened after {self.failures} failures; using fallbacks for {self.reset_timeout}s")
+                self.opened_at = time.monotonic()
+
 
 class OllamaClient:
-    def __init__(self, base_url="http://localhost:11434", model="llama3"):
+    def __init__(self, base_url="http://localhost:11434", model="llama3", timeout=60, connect_timeout=3.05,
+                 pool_size=16, failure_threshold=3, reset_timeout=30.0):
         self.base_url = base_url
         self.model = model
         self.generate_url = f"{base_url}/api/generate"
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # One keep-alive connection pool shared by every caller in the process.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-    def generate(self, prompt, format_json=True):
+    def _payload(self, prompt, format_json, stream):
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream
         }
-        
+
         if format_json:
             payload["format"] = "json"
-        
+        return payload
+
+    def _parse(self, response_text, format_json):
+        if format_json:
+            try:
+                return json.loads(response_text)
+            except json.JSONDecodeError:
+                print(f"Failed to parse JSON from Ollama response: {response_text[:200]}")
+                return None
+        return response_text
+
+    def generate(self, prompt, format_json=True, timeout=None):
+        if not self.breaker.allow():
+            metrics.inc('llm_requests_total', mode='generate', outcome='short_circuit')
+            return None
+
+        start = time.perf_counter()
         try:
-            response = requests.post(self.generate_url, json=payload, timeout=60)
+            response = self.session.post(
+                self.generate_url,
+                json=self._payload(prompt, format_json, False),
+                timeout=(self.connect_timeout, timeout or self.timeout)
+            )
             response.raise_for_status()
-            
+
             result = response.json()
-            response_text = result.get('response', '')
-            
-            if format_json:
-                try:
-                    return json.loads(response_text)
-                except json.JSONDecodeError:
-                    print(f"Failed to parse JSON from Ollama response: {response_text[:200]}")
-                    return None
-            return response_text
-            
+            self.breaker.record_success()
+            self._record('generate', 'ok', start)
+            return self._parse(result.get('response', ''), format_json)
+
         except requests.exceptions.ConnectionError:
-            print("Error: Cannot connect to Ollama. Is it running on localhost:11434?")
-            return None
+            print(f"Error: Cannot connect to Ollama. Is it running on {self.base_url}?")
         except requests.exceptions.Timeout:
             print("Error: Ollama request timed out")
-            return None
         except Exception as e:
             print(f"Ollama client error: {e}")
-            return None
+        self.breaker.record_failure()
+        self._record('generate', 'error', start)
+        return None
+
+    def _record(self, mode, outcome, start):
+        metrics.inc('llm_requests_total', mode=mode, outcome=outcome)
+        metrics.observe('llm_request_duration_seconds', time.perf_counter() - start, mode=mode)
+
+    def generate_stream(self, prompt, format_json=True, timeout=None):
+        # Yields response text pieces as Ollama produces them; timeout bounds
+        # the wait between pieces rather than the whole generation.
+        if not self.breaker.allow():
+            metrics.inc('llm_requests_total', mode='stream', outcome='short_circuit')
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.session.post(
+                self.generate_url,
+                json=self._payload(prompt, format_json, True),
+                timeout=(self.connect_timeout, timeout or self.timeout),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('response'):
+                        yield data['response']
+                    if data.get('done'):
+                        break
+            self.breaker.record_success()
+            self._record('stream', 'ok', start)
+            return
+
+        except GeneratorExit:
+            self.breaker.release()
+            raise
+        except requests.exceptions.ConnectionError:
+            print(f"Error: Cannot connect to Ollama. Is it running on {self.base_url}?")
+        except requests.exceptions.Timeout:
+            print("Error: Ollama stream timed out")
+        except Exception as e:
+            print(f"Ollama client error: {e}")
+        self.breaker.record_failure()
+        self._record('stream', 'error', start)
+
+    async def agenerate(self, prompt, format_json=True, timeout=None):
+        # Runs the pooled blocking call on the default executor so asyncio
+        # callers share the same connections and circuit breaker.
+        return await asyncio.to_thread(self.generate, prompt, format_json, timeout)
 
     def is_available(self):
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except:
             return False
 
-ollama_client = OllamaClient()
+ollama_client = OllamaClient(
+    base_url=os.environ.get('OLLAMA_URL', 'http://localhost:11434'),
+    model=os.environ.get('OLLAMA_MODEL', 'llama3')
+)
@@ -0,0 +1,134 @@
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    # Process-local counters and histograms rendered in the Prometheus text
+    # format; collectors supply values that live elsewhere.
+
+    def __init__(self, prefix='edubox_'):
+        self.prefix = prefix
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = {"kind": kind, "help": help_text, "buckets": tuple(buckets or DEFAULT_BUCKETS)}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta.get(name, {}).get("buckets", DEFAULT_BUCKETS)
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector):
+        # collector() returns (name, kind, help, labels_dict, value) tuples.
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+                          for k, v in self._histograms.items()}
+
+        collected = {}
+        for collector in self._collectors:
+            try:
+                for name, kind, help_text, labels, value in collector():
+                    self._meta.setdefault(name, {"kind": kind, "help": help_text, "buckets": DEFAULT_BUCKETS})
+                    collected[(name, tuple(sorted(labels.items())))] = value
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+        names = sorted({k[0] for k in counters} | {k[0] for k in histograms} | {k[0] for k in collected})
+        for name in names:
+            meta = self._meta.get(name, {"kind": "untyped", "help": name, "buckets": DEFAULT_BUCKETS})
+            full = self.prefix + name
+            lines.append(f"# HELP {full} {meta['help']}")
+            lines.append(f"# TYPE {full} {meta['kind']}")
+            for (series_name, labels), value in sorted(list(counters.items()) + list(collected.items())):
+                if series_name == name:
+                    lines.append(f"{full}{_labels(labels)} {_number(value)}")
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(meta["buckets"], series["buckets"]):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{full}_sum{_labels(labels)} {_number(series['sum'])}")
+                lines.append(f"{full}_count{_labels(labels)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe('stage_duration_seconds', 'histogram', 'Time spent in instrumented backend stages.')
+metrics.describe('llm_requests_total', 'counter', 'Ollama calls by mode and outcome (ok, error, short_circuit).')
+metrics.describe('llm_request_duration_seconds', 'histogram', 'Ollama call latency, including failures.')
+metrics.describe('llm_attempts_total', 'counter', 'Work items that tried the LLM, by kind.')
+metrics.describe('llm_fallbacks_total', 'counter', 'Work items served by a non-LLM fallback, by kind.')
+
+
+def timed_stage(stage):
+    # Records the wrapped call's duration under stage_duration_seconds.
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.timer('stage_duration_seconds', stage=stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_fallback(kind, fell_back, attempts=1):
+    metrics.inc('llm_attempts_total', attempts, kind=kind)
+    if fell_back:
+        metrics.inc('llm_fallbacks_total', fell_back, kind=kind)